@@ -0,0 +1,98 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+import metrics
+
+
+class QueueFull(Exception):
+    pass
+
+
+# ✅ Process-wide admission control: at most N calls in flight, FIFO queue of bounded depth
+class AdmissionController:
+    def __init__(self, max_concurrent=8, max_queue=50, name="openai"):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.name = name
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiting = deque()
+        # (loop, asyncio.Event) of tasks waiting in admit()
+        self._wakers = set()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_concurrent=int(os.environ.get("OPENAI_MAX_CONCURRENT", 8)),
+            max_queue=int(os.environ.get("OPENAI_MAX_QUEUE", 50)),
+        )
+
+    def _publish(self):
+        metrics.set_gauge(f"{self.name}_admission_active", self._active)
+        metrics.set_gauge(f"{self.name}_admission_queue_depth", len(self._waiting))
+
+    def _can_enter(self, ticket):
+        return self._waiting[0] is ticket and self._active < self.max_concurrent
+
+    def _notify(self):
+        # Under the lock: wake every waiting task, on whichever loop it runs
+        for loop, event in self._wakers:
+            loop.call_soon_threadsafe(event.set)
+
+    @asynccontextmanager
+    async def admit(self, on_wait=None, poll=0.5):
+        # on_wait(position) is called (outside the lock) whenever the caller's place in line changes;
+        # waiting suspends the task, so a long queue holds no threads
+        ticket = object()
+        started = time.monotonic()
+        waker = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            if len(self._waiting) >= self.max_queue:
+                metrics.incr(f"{self.name}_admission_rejected_total")
+                raise QueueFull(f"{len(self._waiting)} requests already waiting")
+            self._waiting.append(ticket)
+            self._wakers.add(waker)
+            self._publish()
+        last_position = None
+        try:
+            while True:
+                with self._lock:
+                    waker[1].clear()
+                    if self._can_enter(ticket):
+                        self._waiting.popleft()
+                        self._active += 1
+                        self._publish()
+                        # Everyone behind just moved up one place
+                        self._notify()
+                        break
+                    position = self._waiting.index(ticket) + 1
+                if position == last_position:
+                    try:
+                        await asyncio.wait_for(waker[1].wait(), poll)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if on_wait is not None:
+                    on_wait(position)
+                last_position = position
+        except BaseException:
+            with self._lock:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    self._publish()
+                    self._notify()
+            raise
+        finally:
+            with self._lock:
+                self._wakers.discard(waker)
+        metrics.observe(f"{self.name}_admission_wait_seconds", time.monotonic() - started)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._publish()
+                self._notify()
@@ -0,0 +1,164 @@
+import asyncio
+import hmac
+import json
+import os
+import threading
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+import uvicorn
+from admission import QueueFull
+from engine import Engine
+from generation import Generator, PromptTooLarge, QuotaExceeded
+from prompts import default_prompts
+from quota import client_address, fingerprint
+from retry import ProviderUnavailable
+
+
+# ✅ Headless API: the Streamlit UI's generation pipeline (cache, quota, limiter) over HTTP
+HEARTBEAT_SECONDS = 15
+
+
+def _error(e):
+    if isinstance(e, PromptTooLarge):
+        return 413, {"error": "prompt_too_large", "tokens": e.tokens, "limit": e.limit}
+    if isinstance(e, QuotaExceeded):
+        return 429, {"error": "quota_exceeded", "reason": e.reason}
+    if isinstance(e, QueueFull):
+        return 503, {"error": "queue_full"}
+    if isinstance(e, ProviderUnavailable):
+        return 503, {"error": "provider_unavailable"}
+    return 500, {"error": "internal_error", "message": str(e)}
+
+
+def _summary(generation):
+    return {
+        "source": generation.source,
+        "model": generation.model,
+        "finish_reason": generation.finish_reason,
+        "usage": generation.usage,
+    }
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _produce(pieces, generation, emit):
+    # A task on the server loop; cancelling it abandons the call, so a coalesced follower can take over
+    try:
+        async for piece in pieces:
+            emit(("delta", {"text": piece}))
+        emit(("done", _summary(generation)))
+    except Exception as e:
+        emit(("error", _error(e)[1]))
+    finally:
+        emit(None)
+
+
+def create_app(generator=None):
+    lock = threading.Lock()
+    api_keys = [key.strip() for key in os.environ.get("API_KEYS", "").split(",") if key.strip()]
+
+    def get_generator():
+        nonlocal generator
+        with lock:
+            if generator is None:
+                generator = Generator.from_env(Engine())
+        return generator
+
+    def client_fingerprint(request):
+        # Keyed clients get their own quota; anonymous ones are treated like browser visitors
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if api_keys:
+            if not any(hmac.compare_digest(token, key) for key in api_keys):
+                return None
+            return fingerprint(f"key:{token}")
+        address = client_address(request.headers.get("X-Forwarded-For"), request.client.host if request.client else None)
+        return fingerprint(f"ip:{address}")
+
+    async def templates(request):
+        return JSONResponse({"templates": [{"name": name, "example": example} for name, example in default_prompts.items()]})
+
+    async def generate(request):
+        client = client_fingerprint(request)
+        if client is None:
+            return JSONResponse({"error": "unauthorized"}, status_code=401)
+        try:
+            body = await request.json()
+        except ValueError:
+            return JSONResponse({"error": "invalid_json"}, status_code=400)
+        if not isinstance(body, dict):
+            return JSONResponse({"error": "invalid_json"}, status_code=400)
+        prompt, tool = body.get("prompt"), body.get("tool")
+        if not isinstance(prompt, str) or not prompt.strip():
+            return JSONResponse({"error": "prompt_required"}, status_code=400)
+        if tool is not None and tool not in default_prompts:
+            return JSONResponse({"error": "unknown_tool", "tools": list(default_prompts)}, status_code=400)
+
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def emit(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        generator = get_generator()
+        try:
+            generation = generator.generate(
+                prompt,
+                client,
+                tool=tool,
+                on_queue=lambda position: emit(("queue", {"position": position})),
+                session_id=f"api:{client[:12]}",
+            )
+        except PromptTooLarge as e:
+            status, error = _error(e)
+            return JSONResponse(error, status_code=status)
+
+        # The generation runs on the engine loop; its text is relayed to this one without a thread
+        pieces = generator.engine.relay(generation)
+        if not body.get("stream", True):
+            text = ""
+            try:
+                async for piece in pieces:
+                    text += piece
+            except Exception as e:
+                status, error = _error(e)
+                return JSONResponse(error, status_code=status)
+            return JSONResponse({"text": text, **_summary(generation)})
+
+        producer = asyncio.create_task(_produce(pieces, generation, emit))
+
+        async def stream():
+            try:
+                while True:
+                    try:
+                        event = await asyncio.wait_for(events.get(), HEARTBEAT_SECONDS)
+                    except asyncio.TimeoutError:
+                        # Comment line: keeps proxies from closing an idle stream while queued
+                        yield ": keep-alive\n\n"
+                        continue
+                    if event is None:
+                        return
+                    yield _sse(*event)
+            finally:
+                # Client went away (or the stream ended): stop generating for nobody
+                producer.cancel()
+
+        return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    return Starlette(routes=[
+        Route("/v1/templates", templates, methods=["GET"]),
+        Route("/v1/generate", generate, methods=["POST"]),
+    ])
+
+
+def serve_in_background(app, host="127.0.0.1", port=8000):
+    # Same-process mode: the API shares the Streamlit server's generator and runs on its own thread
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    threading.Thread(target=server.run, name="api-server", daemon=True).start()
+    return server
+
+
+# Standalone worker: uvicorn api:app --port 8000
+app = create_app()
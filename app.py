@@ -1,8 +1,18 @@
 import os
+import time
+import uuid
 import streamlit as st
 import streamlit.components.v1 as components
-import httpx
-from openai import OpenAI
+from api import create_app as create_api, serve_in_background
+from engine import Engine
+from generation import Generator, QuotaExceeded, PromptTooLarge, CACHE, COALESCED
+from prompts import default_prompts
+from visitors import VisitorStats
+from quota import client_address, fingerprint, DAILY as DAILY_LIMIT, RATE as CLIENT_RATE_LIMIT, GLOBAL as GLOBAL_RATE_LIMIT
+from admission import QueueFull
+from retry import ProviderUnavailable
+from artifacts import ArtifactStore, FORMATS as ARTIFACT_FORMATS
+from jobs import JobRunner
 from datetime import datetime
 
 # ✅ Config
@@ -35,58 +45,145 @@ components.html("""
 <script defer data-domain="devops-copilot.onrender.com" src="https://plausible.io/js/script.js"></script>
 """, height=0)
 
-# ✅ Visitor count (from Plausible)
+# ✅ Visitor count (from Plausible, refreshed in the background)
+@st.cache_resource
+def get_visitor_stats():
+    return VisitorStats.from_env().start()
+
 def get_visitor_count():
-    try:
-        headers = {"Authorization": f"Bearer " + os.environ['PLAUSIBLE_API_KEY']}
-        params = {"site_id": "devops-copilot.onrender.com", "period": "day"}
-        response = httpx.get("https://plausible.io/api/v1/stats/visitors", headers=headers, params=params, timeout=5)
-        if response.status_code == 200:
-            return response.json().get("value", 0)
-    except Exception as e:
-        print(f"Visitor count error: {e}")
-    return None
-
-# ✅ OpenAI client
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
-
-# ✅ Prompt templates
-default_prompts = {
-    "Terraform": "Generate Terraform to create an EKS cluster with 2 node groups and S3 backend.",
-    "Docker": "Create a Dockerfile for a Python Flask app with gunicorn.",
-    "CI/CD (GitHub Actions)": "Generate a GitHub Actions workflow to deploy a Node.js app to AWS EC2.",
-    "Kubernetes": "Generate Kubernetes Deployment and Service YAML for a Django app.",
-    "Monitoring (Prometheus)": "Write Prometheus alert rules for high CPU and memory usage.",
-    "IAM Policies": "Create an IAM policy allowing S3 read/write for a Lambda function.",
-    "Helm Charts": "Create a Helm chart for a basic Go web app.",
-    "AWS": "Generate AWS CLI commands to launch an EC2 instance and create an S3 bucket.",
-    "GCP": "Write a GCP Deployment Manager config to deploy a Cloud Function with Pub/Sub trigger.",
-    "Azure": "Write Azure CLI commands to provision an AKS cluster with autoscaling.",
-    "GenAI App Templates": "Create a Python-based LangChain chatbot with OpenAI, memory, and a Streamlit frontend.",
-    "Other": ""
-}
+    return get_visitor_stats().snapshot().value
+
+# ✅ Generation engine (one event loop thread holds every OpenAI stream of this process)
+@st.cache_resource
+def get_engine():
+    return Engine()
+
+# ✅ Generation pipeline (caches, coalescing, quota and admission shared by all sessions)
+@st.cache_resource
+def get_generator():
+    return Generator.from_env(get_engine())
+
+generator = get_generator()
+
+# ✅ Headless API in the same process (optional; shares the generator above)
+@st.cache_resource
+def get_api_server():
+    return serve_in_background(create_api(generator), os.environ.get("API_HOST", "127.0.0.1"), int(os.environ["API_PORT"]))
+
+if os.environ.get("API_PORT"):
+    get_api_server()
+
+# ✅ Download artifacts (content-addressed, shared by all sessions)
+@st.cache_resource
+def get_artifact_store():
+    return ArtifactStore.from_env()
+
+artifact_store = get_artifact_store()
+
+# ✅ Background generation jobs (run by the server, followed by sessions)
+@st.cache_resource
+def get_job_runner():
+    return JobRunner.from_env(generator)
+
+jobs = get_job_runner()
+
+# ✅ Streaming helpers
+def render_stream(chunks, min_interval=0.05):
+    # st.code instead of st.write_stream so HCL/YAML comments aren't rendered as markdown
+    placeholder = st.empty()
+    text, last_render = "", 0.0
+    for piece in chunks:
+        text += piece
+        now = time.monotonic()
+        if now - last_render >= min_interval:
+            placeholder.code(text)
+            last_render = now
+    placeholder.code(text)
+    return text
 
 # ✅ Session state
 for key, default in {
     "user_prompt": "",
+    "prompt_input": "",
     "code_result": "",
-    "request_count": 0,
+    "code_truncated": False,
     "is_generating": False,
-    "should_generate": False,
-    "selected_tool": "Terraform"
+    "selected_tool": "Terraform",
+    "session_id": uuid.uuid4().hex
 }.items():
     if key not in st.session_state:
         st.session_state[key] = default
 
-# ✅ Sidebar
-visitor_count = get_visitor_count()
-MAX_REQUESTS = 5
-remaining = MAX_REQUESTS - st.session_state["request_count"]
+# ✅ Quota (shared across sessions and processes, keyed by client fingerprint)
+quota = generator.quota
+MAX_REQUESTS = quota.daily_limit
+
+QUOTA_MESSAGES = {
+    DAILY_LIMIT: "⚠️ Daily free limit reached. Please come back tomorrow.",
+    CLIENT_RATE_LIMIT: "⏳ You're generating a bit fast. Please wait a few seconds and try again.",
+    GLOBAL_RATE_LIMIT: "🚦 We're at capacity right now. Please try again in a minute.",
+}
 
-st.sidebar.title("📊 Session Stats")
-if visitor_count is not None:
-    st.sidebar.markdown(f"👥 **Visitors Today:** {visitor_count}")
-st.sidebar.markdown(f"🔄 **Free Runs Left:** {remaining} / {MAX_REQUESTS}")
+def client_fingerprint():
+    # Stable across sessions and tabs of the same client, unlike session state
+    headers = st.context.headers
+    address = client_address(headers.get("X-Forwarded-For"), st.context.ip_address)
+    return fingerprint(f"ip:{address}")
+
+def remaining_runs():
+    return quota.remaining(client_fingerprint())
+
+# ✅ Callbacks (run before the script, so each click costs exactly one script run)
+def select_tool():
+    tool = st.session_state["tool_select"]
+    st.session_state.update({
+        "selected_tool": tool,
+        "user_prompt": default_prompts[tool],
+        "prompt_input": default_prompts[tool]
+    })
+
+def use_example():
+    example = default_prompts[st.session_state["selected_tool"]]
+    st.session_state.update({
+        "user_prompt": example,
+        "prompt_input": example
+    })
+
+def start_generation():
+    st.session_state.update({
+        "is_generating": True,
+        "user_prompt": st.session_state["prompt_input"]
+    })
+
+def reset_session():
+    st.session_state.update({
+        "user_prompt": default_prompts[st.session_state["selected_tool"]],
+        "code_result": "",
+        "code_truncated": False,
+        "is_generating": False,
+        "prompt_input": default_prompts[st.session_state["selected_tool"]],
+        "job_id": None
+    })
+    st.query_params.pop("job", None)
+
+# ✅ Sidebar stats (fragment: redrawn on full reruns, i.e. once after each finished generation)
+@st.fragment
+def sidebar_stats():
+    st.title("📊 Session Stats")
+    visitor_count = get_visitor_count()
+    if visitor_count is not None:
+        st.markdown(f"👥 **Visitors Today:** {visitor_count}")
+    st.markdown(f"🔄 **Free Runs Left:** {remaining_runs()} / {MAX_REQUESTS}")
+
+    last_run = st.session_state.get("last_run")
+    if last_run:
+        st.markdown("---")
+        st.markdown(f"🕒 **Last Used**: {last_run['timestamp']}")
+        st.markdown(f"🔧 **Tool**: {last_run['tool']}")
+        st.markdown(f"📝 **Prompt**: {last_run['prompt'][:60]}...")
+
+with st.sidebar:
+    sidebar_stats()
 
 # ✅ Feedback Link (Sidebar)
 st.sidebar.markdown("---")
@@ -96,90 +193,161 @@ st.sidebar.markdown(
     unsafe_allow_html=True
 )
 
-if st.sidebar.button("♻️ Reset Session"):
-    st.session_state.update({
-        "user_prompt": default_prompts[st.session_state["selected_tool"]],
-        "code_result": "",
-        "request_count": 0,
-        "is_generating": False,
-        "should_generate": False,
-        "prompt_input": default_prompts[st.session_state["selected_tool"]]
-    })
-    st.rerun()
+st.sidebar.button("♻️ Reset Session", on_click=reset_session)
 
 # ✅ Hero Section
 st.markdown('<div class="big-title">🧠 Codeweave Copilot</div>', unsafe_allow_html=True)
 st.markdown('<div class="sub-title">Your AI-powered DevOps + GenAI assistant. Generate infra, pipelines, apps instantly.</div>', unsafe_allow_html=True)
 
-# ✅ Tool dropdown
-tool = st.selectbox("🔧 Choose a DevOps or GenAI Template:", list(default_prompts.keys()), index=list(default_prompts.keys()).index(st.session_state["selected_tool"]), disabled=st.session_state["is_generating"])
-if tool != st.session_state["selected_tool"]:
-    st.session_state["selected_tool"] = tool
-    st.session_state["user_prompt"] = default_prompts[tool]
-    st.session_state["prompt_input"] = default_prompts[tool]
-    st.rerun()
-
-# ✅ Example prompt
-example = default_prompts.get(tool, "")
-with st.expander("📌 Example Prompt", expanded=False):
-    st.code(example)
-    if st.button("Use this example prompt"):
-        st.session_state["user_prompt"] = example
-        st.session_state["prompt_input"] = example
-        st.rerun()
-
-# ✅ Usage limit
-if remaining <= 0:
-    st.error("⚠️ Daily free limit reached. Please come back tomorrow or reset.")
-    st.stop()
-
-# ✅ Prompt Input
-user_prompt = st.text_area("📝 Describe what you want:", value=st.session_state.get("prompt_input", st.session_state["user_prompt"]), height=200, key="prompt_input")
-
-# ✅ Generate Button
-if st.button("🚀 Generate Code"):
-    st.session_state.update({
-        "is_generating": True,
-        "should_generate": True,
-        "user_prompt": user_prompt
-    })
-    st.rerun()
+# ✅ Inputs (fragment: editing the prompt or switching tools doesn't resend the output)
+@st.fragment
+def prompt_inputs():
+    tools = list(default_prompts.keys())
+    tool = st.selectbox("🔧 Choose a DevOps or GenAI Template:", tools, index=tools.index(st.session_state["selected_tool"]), key="tool_select", on_change=select_tool)
+
+    with st.expander("📌 Example Prompt", expanded=False):
+        st.code(default_prompts.get(tool, ""))
+        st.button("Use this example prompt", on_click=use_example)
+
+    st.text_area("📝 Describe what you want:", height=200, key="prompt_input")
+
+    # Compacted and counted locally on every edit (the fragment reruns), so nothing oversized reaches OpenAI
+    compaction = generator.prepare(st.session_state["prompt_input"], tool)
+    tokens, limit = compaction.tokens_after, generator.max_prompt_tokens
+    saved = f" · 🗜️ {compaction.tokens_before - tokens:,} saved by compaction" if tokens < compaction.tokens_before else ""
+    if tokens <= limit:
+        st.caption(f"🔢 {tokens:,} / {limit:,} tokens{saved}")
+    elif generator.trim_prompts:
+        st.warning(f"✂️ {tokens:,} / {limit:,} tokens{saved} — the prompt will be trimmed to fit.")
+    else:
+        st.error(f"🚫 {tokens:,} / {limit:,} tokens{saved} — please shorten the prompt.")
 
 # ✅ OpenAI Request
-if st.session_state["should_generate"]:
-    st.session_state["should_generate"] = False
+def clear_on_first(chunks, placeholder):
+    for index, piece in enumerate(chunks):
+        if index == 0:
+            placeholder.empty()
+        yield piece
+
+def run_generation(status, user_prompt=None, job_id=None):
+    # Starts a background job for user_prompt, or reattaches to job_id; either way only follows it,
+    # so a rerun or reconnect mid-stream interrupts the view, never the generation.
+    # Returns True once an answer has been shown in full
+    finished = False
     with st.spinner("🤖 Generating code using OpenAI..."):
         try:
-            timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
-            st.sidebar.markdown("---")
-            st.sidebar.markdown(f"🕒 **Last Used**: {timestamp}")
-            st.sidebar.markdown(f"🔧 **Tool**: {tool}")
-            st.sidebar.markdown(f"📝 **Prompt**: {user_prompt[:60]}...")
-
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": "You are a DevOps and GenAI assistant. Return production-ready code only. Use correct formats: HCL, YAML, Dockerfile, Python, etc. No markdown or explanations."},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.2,
-                max_tokens=2000,
-            )
-
-            code = response.choices[0].message.content
-            st.session_state["code_result"] = code
-            st.session_state["request_count"] += 1
+            if job_id is None:
+                st.session_state["last_run"] = {
+                    "timestamp": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"),
+                    "tool": st.session_state["selected_tool"],
+                    "prompt": user_prompt
+                }
+                job_id = jobs.start(
+                    user_prompt,
+                    client_fingerprint(),
+                    tool=st.session_state["selected_tool"],
+                    session_id=st.session_state["session_id"]
+                )
+                # In the URL too, so a reload or a new session can pick the job back up
+                st.session_state["job_id"] = job_id
+                st.query_params["job"] = job_id
+
+            queue_note = st.empty()
+            followed = jobs.follow(job_id, on_queue=lambda position: queue_note.info(f"⏳ Busy right now — you are #{position} in line..."))
+            st.markdown("### 🧾 Generated Code")
+            code = render_stream(clear_on_first(followed, queue_note))
+            job = jobs.get(job_id)
+            # "length": out of continuations or context window, so the answer stops mid-way
+            st.session_state.update({"code_result": code, "code_truncated": job.finish_reason == "length"})
+            source = job.source
+            if source == CACHE:
+                st.toast("⚡ Served from cache")
+            elif source == COALESCED:
+                st.toast("🤝 Shared with an identical request in progress")
+            finished = True
+        except PromptTooLarge as e:
+            status.warning(f"🚫 Your prompt is {e.tokens:,} tokens; the limit is {e.limit:,}. Please shorten it and try again.")
+        except QuotaExceeded as e:
+            status.warning(QUOTA_MESSAGES[e.reason])
+        except QueueFull:
+            status.warning("🚦 The queue is full right now. Please try again in a minute.")
+        except ProviderUnavailable:
+            status.warning("🌩️ OpenAI is overloaded right now and didn't recover in time. Please try again shortly.")
         except Exception as e:
-            st.error(f"❌ Error generating code: {e}")
-        finally:
-            st.session_state["is_generating"] = False
-            st.rerun()
+            status.error(f"❌ Error generating code: {e}")
+    # Only reached when the job was followed to the end (interrupted runs raise past this)
+    st.session_state["job_seen"] = job_id
+    return finished
+
+def pending_job():
+    # A job of this client that this session hasn't shown in full yet: after a rerun, reconnect or reload
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    if not job_id or job_id == st.session_state.get("job_seen"):
+        return None
+    job = jobs.get(job_id)
+    if job is None or job.fingerprint != client_fingerprint():
+        st.session_state["job_id"] = None
+        st.query_params.pop("job", None)
+        return None
+    st.session_state["job_id"] = job_id
+    return job_id
 
 # ✅ Output Section
-if st.session_state["code_result"]:
-    st.markdown("### 🧾 Generated Code")
-    st.code(st.session_state["code_result"])
-    st.download_button("💾 Download Code", data=st.session_state["code_result"], file_name="generated_code.txt", mime="text/plain")
+def render_output():
+    if st.session_state["code_result"]:
+        st.markdown("### 🧾 Generated Code")
+        st.code(st.session_state["code_result"])
+        if st.session_state["code_truncated"]:
+            st.warning("⚠️ The output was truncated: the answer hit the length limit and is incomplete. Try a narrower prompt or ask for one part at a time.")
+        # Bytes are built only when the button is clicked (the callable runs then), not on every rerun
+        fmt = st.radio("Download as", list(ARTIFACT_FORMATS), horizontal=True, key="download_format")
+        code = st.session_state["code_result"]
+        file_name, mime = ARTIFACT_FORMATS[fmt]
+        st.download_button(
+            "💾 Download Code",
+            data=lambda: artifact_store.package(artifact_store.put(code), fmt)[0],
+            file_name=file_name,
+            mime=mime,
+            on_click="ignore"
+        )
+
+# ✅ Generate + output (fragment: a Generate click reruns only this region)
+@st.fragment
+def generation_panel():
+    # No up-front quota check: cache and coalesced hits are free, and a run that would need
+    # quota is turned away with QuotaExceeded
+    job_id = pending_job()
+
+    button = st.empty()
+    status = st.empty()
+    output = st.empty()
+
+    # The Generate click already flipped is_generating in its callback: lock the button,
+    # generate, then swap the live button back in — all within this single fragment run
+    if st.session_state["is_generating"]:
+        button.button("🚀 Generate Code", key="generate_locked", disabled=True)
+        # Cleared up front so an interrupted run never triggers a second generation
+        st.session_state["is_generating"] = False
+        with output.container():
+            finished = run_generation(status, user_prompt=st.session_state["user_prompt"])
+    elif job_id:
+        # Reattach instead of starting over: the job kept running while this session was away
+        button.button("🚀 Generate Code", key="generate_locked", disabled=True)
+        with output.container():
+            finished = run_generation(status, job_id=job_id)
+    else:
+        finished = False
+    if finished:
+        # One full rerun per answer brings the sidebar's free runs and last use up to date;
+        # failures skip it so their message stays on screen
+        st.rerun(scope="app")
+
+    button.button("🚀 Generate Code", key="generate", on_click=start_generation)
+    with output.container():
+        render_output()
+
+prompt_inputs()
+generation_panel()
 
 # ✅ Footer & Feedback
 st.markdown("---")
@@ -0,0 +1,80 @@
+import gzip
+import hashlib
+import io
+import os
+import time
+import zipfile
+
+
+FORMATS = {
+    "txt": ("generated_code.txt", "text/plain"),
+    "zip": ("generated_code.zip", "application/zip"),
+    "gzip": ("generated_code.txt.gz", "application/gzip"),
+}
+
+
+# ✅ Content-addressed artifact store: identical outputs are stored once for all sessions
+class ArtifactStore:
+    def __init__(self, directory, max_age=7 * 24 * 3600):
+        self.directory = directory
+        self.max_age = max_age
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.environ.get("ARTIFACT_DIR", ".cache/artifacts"),
+            max_age=float(os.environ.get("ARTIFACT_MAX_AGE", 7 * 24 * 3600)),
+        )
+
+    def _path(self, digest, fmt):
+        return os.path.join(self.directory, f"{digest}.{fmt}")
+
+    def put(self, text):
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest, "txt")
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            self._write(path, data)
+            self.prune()
+        return digest
+
+    def package(self, digest, fmt="txt"):
+        # Bytes are only materialized here, when the user actually asks for a download
+        file_name, mime = FORMATS[fmt]
+        path = self._path(digest, fmt)
+        if not os.path.exists(path):
+            with open(self._path(digest, "txt"), "rb") as f:
+                raw = f.read()
+            self._write(path, self._encode(raw, fmt))
+        with open(path, "rb") as f:
+            return f.read(), file_name, mime
+
+    def _encode(self, raw, fmt):
+        if fmt == "gzip":
+            return gzip.compress(raw, mtime=0)
+        if fmt == "zip":
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr(FORMATS["txt"][0], raw)
+            return buffer.getvalue()
+        return raw
+
+    def _write(self, path, data):
+        # Write-then-rename so concurrent sessions never read a half-written file
+        tmp = f"{path}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def prune(self):
+        cutoff = time.time() - self.max_age
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
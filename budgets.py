@@ -0,0 +1,52 @@
+import os
+import threading
+from collections import defaultdict, deque
+import metrics
+
+
+# ✅ Per-category max_tokens learned from recent completion sizes
+class TokenBudgets:
+    def __init__(self, default=2000, floor=256, ceiling=4096, headroom=1.25, percentile=99, min_samples=20, growth=2.0, window=200):
+        self.default = default
+        self.floor = floor
+        self.ceiling = ceiling
+        self.headroom = headroom
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.growth = growth
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+
+    @classmethod
+    def from_env(cls, default):
+        return cls(
+            default=default,
+            floor=int(os.environ.get("MAX_TOKENS_FLOOR", 256)),
+            ceiling=int(os.environ.get("MAX_TOKENS_CEILING", 4096)),
+            headroom=float(os.environ.get("MAX_TOKENS_HEADROOM", 1.25)),
+            percentile=float(os.environ.get("MAX_TOKENS_PERCENTILE", 99)),
+        )
+
+    def budget(self, tool):
+        with self._lock:
+            values = sorted(self._samples[tool])
+        if len(values) < self.min_samples:
+            return self.default
+        p = values[min(len(values) - 1, int(self.percentile / 100 * len(values)))]
+        budget = int(min(self.ceiling, max(self.floor, p * self.headroom)))
+        metrics.set_gauge(f"max_tokens_budget:{tool}", budget)
+        return budget
+
+    def record(self, tool, completion_tokens):
+        metrics.observe(f"completion_tokens:{tool}", completion_tokens)
+        with self._lock:
+            self._samples[tool].append(completion_tokens)
+
+    def grow(self, tool, current):
+        # A truncated answer only tells us the real size is larger than `current`;
+        # record the grown budget so the percentile moves up right away
+        grown = int(min(self.ceiling, current * self.growth))
+        metrics.incr(f"max_tokens_truncations_total:{tool}")
+        with self._lock:
+            self._samples[tool].append(grown)
+        return grown
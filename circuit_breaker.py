@@ -0,0 +1,81 @@
+import threading
+import time
+import metrics
+
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+_STATE_GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+# ✅ Circuit breaker with exponential cool-down between open periods
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=3, base_cooldown=30, max_cooldown=900):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opens = 0
+        self._retry_at = 0.0
+        self._probe_in_flight = False
+        self._publish()
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def retry_in(self):
+        # Seconds until an open circuit lets a probe through; 0 when it isn't open
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._retry_at - time.monotonic())
+
+    def allow(self):
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                # Let exactly one probe through to test recovery
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opens = 0
+            self._probe_in_flight = False
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                cooldown = min(self.max_cooldown, self.base_cooldown * 2 ** self._opens)
+                self._opens += 1
+                self._retry_at = time.monotonic() + cooldown
+                self._transition(OPEN)
+
+    def _maybe_half_open(self):
+        if self._state == OPEN and time.monotonic() >= self._retry_at:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state):
+        if state != self._state:
+            self._state = state
+            metrics.incr(f"{self.name}_breaker_{state}_total")
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge(f"{self.name}_breaker_state", _STATE_GAUGE[self._state])
+        metrics.set_gauge(f"{self.name}_breaker_consecutive_failures", self._failures)
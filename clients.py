@@ -0,0 +1,37 @@
+import os
+import httpx
+from openai import AsyncOpenAI
+
+
+# ✅ Pool settings (override via environment)
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+def _env_float(name, default):
+    return float(os.environ.get(name, default))
+
+def _env_flag(name, default):
+    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def http_limits():
+    return httpx.Limits(
+        max_connections=_env_int("OPENAI_MAX_CONNECTIONS", 50),
+        max_keepalive_connections=_env_int("OPENAI_MAX_KEEPALIVE", 20),
+        keepalive_expiry=_env_float("OPENAI_KEEPALIVE_EXPIRY", 60.0),
+    )
+
+
+def http_timeout():
+    return httpx.Timeout(_env_float("OPENAI_TIMEOUT", 120.0), connect=_env_float("OPENAI_CONNECT_TIMEOUT", 10.0))
+
+
+# ✅ One OpenAI client (and one connection pool) per process; create it on the engine's event loop
+def create_async_openai_client():
+    http_client = httpx.AsyncClient(
+        limits=http_limits(),
+        timeout=http_timeout(),
+        http2=_env_flag("OPENAI_HTTP2", "true"),
+    )
+    # Retries are owned by retry.RetryPolicy; SDK retries would multiply its attempts
+    return AsyncOpenAI(api_key=os.environ["OPENAI_API_KEY"], http_client=http_client, max_retries=0)
@@ -0,0 +1,247 @@
+import json
+import re
+
+
+# ✅ Prompt compaction: language-aware minifiers for code pasted into a prompt
+ALIASES = {
+    "hcl": "hcl", "terraform": "hcl", "tf": "hcl",
+    "yaml": "yaml", "yml": "yaml",
+    "json": "json",
+    "dockerfile": "dockerfile", "docker": "dockerfile",
+}
+
+_FENCED = re.compile(r"```([\w.+-]*)[ \t]*\n(.*?)```", re.DOTALL)
+_HCL_BLOCK = re.compile(r"^\s*(resource|data|module|variable|output|provider|terraform|locals)\b[^\n]*\{\s*$", re.MULTILINE)
+_DOCKER_FROM = re.compile(r"^\s*FROM\s+\S", re.MULTILINE | re.IGNORECASE)
+_YAML_KEY = re.compile(r"^\s*(-\s+)?[\w.\-/\"']+:(\s|$)")
+_HEREDOC = re.compile(r"<<-?[\"']?(\w+)[\"']?\s*$")
+_BLOCK_SCALAR = re.compile(r"(:|^-|\s-)\s*[|>][+-]?\d*$")
+_DOCKER_DIRECTIVE = re.compile(r"^#\s*\w+\s*=")
+_CODE_START = {
+    "hcl": _HCL_BLOCK,
+    "dockerfile": re.compile(r"^\s*(ARG|FROM)\s+\S", re.IGNORECASE),
+    "json": re.compile(r"^\s*[{\[]\s*$"),
+    "yaml": re.compile(r"^(---\s*$|apiVersion:|[\w.-]+:\s*$)"),
+}
+
+
+def detect(code):
+    stripped = code.strip()
+    if stripped[:1] in "{[":
+        try:
+            json.loads(stripped)
+            return "json"
+        except ValueError:
+            pass
+    if _HCL_BLOCK.search(code):
+        return "hcl"
+    if _DOCKER_FROM.search(code):
+        return "dockerfile"
+    lines = [line for line in code.splitlines() if line.strip() and not line.lstrip().startswith("#")]
+    keys = sum(1 for line in lines if _YAML_KEY.match(line))
+    if keys >= 3 and keys >= len(lines) / 2:
+        return "yaml"
+    return None
+
+
+def _indent(line):
+    return len(line) - len(line.lstrip())
+
+
+def _strip_hcl_comments(line, in_block_comment):
+    # Returns the line without #, // and /* */ comments, and whether a block comment is still open
+    out, i, quoted = [], 0, False
+    while i < len(line):
+        if in_block_comment:
+            end = line.find("*/", i)
+            if end < 0:
+                return "".join(out), True
+            in_block_comment, i = False, end + 2
+            continue
+        char = line[i]
+        if quoted:
+            out.append(char)
+            if char == "\\" and i + 1 < len(line):
+                out.append(line[i + 1])
+                i += 1
+            elif char == '"':
+                quoted = False
+        elif char == '"':
+            quoted = True
+            out.append(char)
+        elif char == "#" or line.startswith("//", i):
+            break
+        elif line.startswith("/*", i):
+            in_block_comment = True
+            i += 1
+        else:
+            out.append(char)
+        i += 1
+    return "".join(out), in_block_comment
+
+
+def minify_hcl(code):
+    # Indentation is not semantic in HCL; heredoc bodies are content and kept verbatim
+    lines, heredoc, in_block_comment = [], None, False
+    for line in code.splitlines():
+        if heredoc:
+            lines.append(line)
+            if line.strip() == heredoc:
+                heredoc = None
+            continue
+        line, in_block_comment = _strip_hcl_comments(line, in_block_comment)
+        line = line.strip()
+        if line:
+            lines.append(line)
+            match = _HEREDOC.search(line)
+            if match:
+                heredoc = match.group(1)
+    return "\n".join(lines)
+
+
+def _strip_yaml_comment(line):
+    quote = None
+    for i, char in enumerate(line):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in "'\"" and (i == 0 or line[i - 1] in " \t:-[{,"):
+            quote = char
+        elif char == "#" and (i == 0 or line[i - 1] in " \t"):
+            return line[:i]
+    return line
+
+
+def minify_yaml(code):
+    # Indentation is semantic in YAML: only comments, blank lines and trailing spaces go.
+    # Block scalars (| and >) are content and kept verbatim
+    lines, block_indent = [], None
+    for line in code.splitlines():
+        if block_indent is not None:
+            if not line.strip() or _indent(line) > block_indent:
+                lines.append(line.rstrip())
+                continue
+            block_indent = None
+        line = _strip_yaml_comment(line).rstrip()
+        if not line.strip():
+            continue
+        lines.append(line)
+        if _BLOCK_SCALAR.search(line):
+            block_indent = _indent(line)
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+def minify_json(code):
+    try:
+        return json.dumps(json.loads(code), separators=(",", ":"), ensure_ascii=False)
+    except ValueError:
+        return "\n".join(line.strip() for line in code.splitlines() if line.strip())
+
+
+def minify_dockerfile(code):
+    # Comment lines are dropped (parser directives at the top are kept); heredoc bodies are content
+    lines, heredoc, preamble = [], None, True
+    for line in code.splitlines():
+        if heredoc:
+            lines.append(line)
+            if line.strip() == heredoc:
+                heredoc = None
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            if preamble and _DOCKER_DIRECTIVE.match(line):
+                lines.append(line)
+            continue
+        preamble = False
+        lines.append(line)
+        match = _HEREDOC.search(line)
+        if match:
+            heredoc = match.group(1)
+    return "\n".join(lines)
+
+
+MINIFIERS = {
+    "hcl": minify_hcl,
+    "yaml": minify_yaml,
+    "json": minify_json,
+    "dockerfile": minify_dockerfile,
+}
+
+
+def _hcl_blocks(code):
+    block, depth = [], 0
+    for line in code.splitlines():
+        block.append(line)
+        depth += line.count("{") - line.count("}")
+        if depth <= 0:
+            yield "\n".join(block)
+            block, depth = [], 0
+    if block:
+        yield "\n".join(block)
+
+
+def dedupe(code, language):
+    # Drop exact repeats of a top-level HCL block or YAML document, leaving a marker behind
+    if language == "hcl":
+        blocks, separator, marker = list(_hcl_blocks(code)), "\n", "# (duplicate block omitted)"
+    elif language == "yaml":
+        blocks, separator, marker = code.split("\n---\n"), "\n---\n", "# (duplicate document omitted)"
+    else:
+        return code
+    seen, kept = set(), []
+    for block in blocks:
+        # Single lines and stray braces are never treated as blocks
+        if "\n" in block.strip() and block in seen:
+            kept.append(marker)
+            continue
+        seen.add(block)
+        kept.append(block)
+    return separator.join(kept)
+
+
+def minify(code, language):
+    return dedupe(MINIFIERS[language](code), language)
+
+
+def _tidy_prose(text):
+    return re.sub(r"\n{3,}", "\n\n", re.sub(r"[ \t]+(?=\n|$)", "", text))
+
+
+def _compact_unfenced(text):
+    # Prose first, then pasted code: minify from the first line that starts a recognisable snippet
+    lines = text.splitlines()
+    for index, line in enumerate(lines):
+        for language, start in _CODE_START.items():
+            if start.match(line):
+                rest = "\n".join(lines[index:])
+                if detect(rest) == language:
+                    # Comments right above the snippet belong to it
+                    while index and lines[index - 1].lstrip().startswith(("#", "//")):
+                        index -= 1
+                    rest = "\n".join(lines[index:])
+                    head = _tidy_prose("\n".join(lines[:index])).strip()
+                    return f"{head}\n{minify(rest, language)}" if head else minify(rest, language)
+    return _tidy_prose(text).strip()
+
+
+def compact(text):
+    if "```" not in text:
+        return _compact_unfenced(text)
+
+    def replace(match):
+        language = ALIASES.get(match.group(1).lower()) or detect(match.group(2))
+        if language is None:
+            return match.group(0)
+        return f"```{match.group(1)}\n{minify(match.group(2), language)}\n```"
+
+    parts, last = [], 0
+    for match in _FENCED.finditer(text):
+        parts.append(_tidy_prose(text[last:match.start()]))
+        parts.append(replace(match))
+        last = match.end()
+    parts.append(_tidy_prose(text[last:]))
+    return "".join(parts).strip()
@@ -0,0 +1,32 @@
+import re
+
+
+_OPENING_FENCE = re.compile(r"^\s*```[\w.+-]*[ \t]*\n")
+
+
+def overlap(previous, candidate, min_overlap=8, max_overlap=400):
+    # Length of the longest suffix of `previous` that `candidate` starts with
+    tail = previous[-max_overlap:]
+    for size in range(min(len(tail), len(candidate)), min_overlap - 1, -1):
+        if tail.endswith(candidate[:size]):
+            return size
+    return 0
+
+
+# ✅ Stitch a continuation onto a truncated answer so the seam is invisible
+async def stitch(previous, pieces, lookahead=200):
+    # Hold back the first `lookahead` characters: enough to spot a repeated tail or a fresh
+    # code fence, short enough that the pause at the seam is barely noticeable
+    pieces = aiter(pieces)
+    head = ""
+    async for piece in pieces:
+        head += piece
+        if len(head) >= lookahead:
+            break
+    if "```" not in previous:
+        head = _OPENING_FENCE.sub("", head, count=1)
+    head = head[overlap(previous, head):]
+    if head:
+        yield head
+    async for piece in pieces:
+        yield piece
@@ -0,0 +1,118 @@
+import asyncio
+import queue
+import threading
+import metrics
+from clients import create_async_openai_client
+
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error):
+        self.error = error
+
+
+# ✅ An async provider stream, counted as open on its engine until closed
+class _Stream:
+    def __init__(self, engine, stream):
+        self._engine = engine
+        self._stream = stream
+        self._closed = False
+        engine._track(1)
+
+    def __aiter__(self):
+        return self._stream.__aiter__()
+
+    async def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._engine._track(-1)
+        await self._stream.close()
+
+
+# ✅ Generation engine: one event loop per process, on its own thread, holding every OpenAI stream
+class Engine:
+    def __init__(self, client_factory=create_async_openai_client, name="generation-engine"):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name=name, daemon=True)
+        self._thread.start()
+        self._lock = threading.Lock()
+        self._open_streams = 0
+        # The async client and its httpx pool are bound to the loop that creates them
+        self.client = self.submit(self._create(client_factory)).result()
+
+    @staticmethod
+    async def _create(factory):
+        return factory()
+
+    def _track(self, delta):
+        with self._lock:
+            self._open_streams += delta
+            metrics.set_gauge("engine_open_streams", self._open_streams)
+
+    def submit(self, coro):
+        # A concurrent.futures.Future: block on .result(), or await asyncio.wrap_future(...) from another loop
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def stream(self, **kwargs):
+        # On the loop: start a chat completion stream for the generation pipeline
+        return _Stream(self, await self.client.chat.completions.create(stream=True, **kwargs))
+
+    async def _pump(self, aiterable, put):
+        # On the loop: hands each item to put(), then _END (or a _Failure); cancelling it closes the iterator
+        iterator = aiter(aiterable)
+        try:
+            async for item in iterator:
+                put(item)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            put(_Failure(e))
+        finally:
+            await iterator.aclose()
+            put(_END)
+
+    @staticmethod
+    def _unwrap(item):
+        if isinstance(item, _Failure):
+            raise item.error
+        return item
+
+    def iterate(self, aiterable):
+        # Sync view of an async iterator run on the loop, for callers without a loop of their own;
+        # closing it cancels the iterator
+        items = queue.Queue()
+        future = self.submit(self._pump(aiterable, items.put))
+        try:
+            while True:
+                item = items.get()
+                if item is _END:
+                    return
+                yield self._unwrap(item)
+        finally:
+            future.cancel()
+
+    async def relay(self, aiterable):
+        # The same from another event loop (e.g. the API server's), without a thread
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+
+        def put(item):
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(items.put_nowait, item)
+
+        future = self.submit(self._pump(aiterable, put))
+        try:
+            while True:
+                item = await items.get()
+                if item is _END:
+                    return
+                yield self._unwrap(item)
+        finally:
+            future.cancel()
+
+    def close(self):
+        self.submit(self.client.close()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,344 @@
+import asyncio
+import os
+import time
+from collections import namedtuple
+import metrics
+from admission import AdmissionController, QueueFull
+from budgets import TokenBudgets
+from compaction import compact
+from continuation import stitch
+from hedging import Hedger
+from ledger import UsageLedger, caches_prompts
+from near_duplicate import MinHashIndex
+from prompts import system_prompt
+from quota import QuotaStore
+from response_cache import ResponseCache
+from retry import RetryPolicy
+from routing import Router
+from singleflight import FlightAbandoned, SingleFlight
+from tokens import context_window, count_messages, count_tokens, truncate
+
+
+# ✅ Generation settings (MODEL is the strong tier; the router may pick a faster one)
+MODEL = "gpt-4"
+SYSTEM_PROMPT = system_prompt(full=caches_prompts(MODEL))
+TEMPERATURE = 0.2
+MAX_TOKENS = 2000
+# A continuation with less room than this left in the context window isn't worth a request
+MIN_CONTINUATION_TOKENS = 256
+CONTINUE_PROMPT = "Your previous answer was cut off. Continue exactly where it stopped, mid-line if needed. Do not repeat anything and do not add code fences or commentary."
+
+CACHE = "cache"
+COALESCED = "coalesced"
+OPENAI = "openai"
+
+
+# Prompt as sent, the model it routes to, and its size before and after compaction
+Compaction = namedtuple("Compaction", "text model tokens_before tokens_after")
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class PromptTooLarge(Exception):
+    def __init__(self, tokens, limit):
+        super().__init__(f"prompt is {tokens} tokens, the limit is {limit}")
+        self.tokens = tokens
+        self.limit = limit
+
+
+async def stream_text(stream, meta=None):
+    async for chunk in stream:
+        if getattr(chunk, "usage", None) and meta is not None:
+            # With include_usage the last chunk carries usage and no choices
+            meta["usage"] = chunk.usage
+        if not chunk.choices:
+            continue
+        choice = chunk.choices[0]
+        if choice.finish_reason and meta is not None:
+            meta["finish_reason"] = choice.finish_reason
+        if choice.delta.content:
+            yield choice.delta.content
+
+
+# ✅ One generation: iterate it for text; source/text/finish_reason are filled in as it runs
+class Generation:
+    def __init__(self, generator, prompt, fingerprint, tool=None, on_queue=None, session_id=None):
+        self._generator = generator
+        self.prompt = prompt
+        self.fingerprint = fingerprint
+        self.tool = tool
+        self.on_queue = on_queue
+        self.session_id = session_id
+        self.model = generator.router.choose(tool, prompt)
+        # The long prefix only goes to models that cache it; the others would pay for it on every call
+        self.system_prompt = system_prompt(tool, full=caches_prompts(self.model))
+        self.text = ""
+        self.source = None
+        self.finish_reason = None
+        # Summed over the initial call and any continuations
+        self.usage = {"estimated_prompt_tokens": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+    async def __aiter__(self):
+        # Runs on the generator's engine loop (engine.submit / engine.relay), where its client lives
+        try:
+            async for piece in self._generator._run(self):
+                self.text += piece
+                yield piece
+        finally:
+            # Interrupted generations are recorded too: their tokens were billed all the same
+            await asyncio.to_thread(self._generator.account, self)
+
+    def __iter__(self):
+        # Sync view for callers without an event loop (scripts, tests); closing it cancels the run
+        return self._generator.engine.iterate(self)
+
+
+# ✅ Generation pipeline: cache → near-duplicate cache → coalescing → quota → admission → OpenAI
+class Generator:
+    def __init__(self, engine, cache, near_index, quota, admission, flights=None, retry=None, hedger=None, router=None, budgets=None, ledger=None, max_continuations=3, max_prompt_tokens=3000, trim_prompts=False, compaction=True):
+        # Every generation runs as a task on the engine's event loop, not on a thread of its own
+        self.engine = engine
+        self.cache = cache
+        self.near_index = near_index
+        self.quota = quota
+        self.admission = admission
+        self.flights = flights or SingleFlight()
+        self.retry = retry or RetryPolicy()
+        self.hedger = hedger or Hedger()
+        self.router = router or Router.from_env(MODEL)
+        # Learned per-tool max_tokens; MAX_TOKENS stays the nominal value in cache keys since only
+        # answers that finished on their own are cached, whatever budget they ran under
+        self.budgets = budgets or TokenBudgets(default=MAX_TOKENS)
+        self.ledger = ledger
+        self.max_continuations = max_continuations
+        # Checked locally before any cache lookup, quota slot or API call
+        self.max_prompt_tokens = max_prompt_tokens
+        self.trim_prompts = trim_prompts
+        self.compaction = compaction
+
+    @classmethod
+    def from_env(cls, engine):
+        cache = ResponseCache.from_env()
+        near_index = MinHashIndex.from_env()
+        near_index.rebuild(cache.iter_entries(near_index.max_entries))
+        return cls(
+            engine, cache, near_index, QuotaStore.from_env(), AdmissionController.from_env(),
+            retry=RetryPolicy.from_env(),
+            hedger=Hedger.from_env(),
+            router=Router.from_env(MODEL),
+            budgets=TokenBudgets.from_env(MAX_TOKENS),
+            ledger=UsageLedger.from_env(),
+            max_continuations=int(os.environ.get("MAX_CONTINUATIONS", 3)),
+            max_prompt_tokens=int(os.environ.get("PROMPT_MAX_TOKENS", 3000)),
+            trim_prompts=os.environ.get("PROMPT_OVERSIZE", "reject").lower() == "trim",
+            compaction=os.environ.get("PROMPT_COMPACTION", "true").strip().lower() in ("1", "true", "yes", "on"),
+        )
+
+    def prepare(self, prompt, tool=None):
+        # Compact pasted code, then count with the tokenizer of the model the prompt routes to
+        model = self.router.choose(tool, prompt)
+        text = compact(prompt) if self.compaction else prompt
+        before = count_tokens(prompt, model)
+        after = count_tokens(text, model) if text != prompt else before
+        return Compaction(text, model, before, after)
+
+    def generate(self, prompt, fingerprint, tool=None, on_queue=None, session_id=None):
+        compaction = self.prepare(prompt, tool)
+        prompt, tokens = compaction.text, compaction.tokens_after
+        metrics.incr("compaction_tokens_saved_total", compaction.tokens_before - compaction.tokens_after)
+        if tokens > self.max_prompt_tokens:
+            if not self.trim_prompts:
+                metrics.incr("prompts_rejected_total")
+                raise PromptTooLarge(tokens, self.max_prompt_tokens)
+            metrics.incr("prompts_trimmed_total")
+            prompt = truncate(prompt, self.max_prompt_tokens, compaction.model)
+        return Generation(self, prompt, fingerprint, tool, on_queue, session_id)
+
+    # Cache tiers
+    def lookup(self, prompt, model=MODEL, system=SYSTEM_PROMPT):
+        cached = self.cache.get(model, system, prompt, TEMPERATURE, MAX_TOKENS)
+        if cached is not None:
+            return cached
+        context = self.cache.context_for(model, system, TEMPERATURE, MAX_TOKENS)
+        match = self.near_index.query(context, prompt, self.cache.prompt_for)
+        if match is None:
+            return None
+        cached = self.cache.get_by_key(match[0])
+        if cached is None:
+            # Expired or evicted from the persistent store since it was indexed
+            self.near_index.remove(match[0])
+        return cached
+
+    def store(self, prompt, response, model=MODEL, system=SYSTEM_PROMPT):
+        key = self.cache.put(model, system, prompt, TEMPERATURE, MAX_TOKENS, response)
+        self.near_index.add(key, self.cache.context_for(model, system, TEMPERATURE, MAX_TOKENS), prompt)
+
+    async def _run(self, generation):
+        # SQLite lookups and writes go to worker threads so they never stall the loop
+        cached = await asyncio.to_thread(self.lookup, generation.prompt, generation.model, generation.system_prompt)
+        if cached is not None:
+            # Cache hits are free: no OpenAI call, no quota used
+            generation.source = CACHE
+            generation.finish_reason = "stop"
+            yield cached
+            return
+
+        key = self.cache.key_for(generation.model, generation.system_prompt, generation.prompt, TEMPERATURE, MAX_TOKENS)
+        while True:
+            flight, leader = self.flights.join(key)
+            if leader:
+                async for piece in self._lead(generation, key, flight):
+                    yield piece
+                return
+            # Followers ride along on the leader's stream and spend nothing
+            generation.source = COALESCED
+            emitted = False
+            try:
+                async for piece in flight.stream():
+                    emitted = True
+                    yield piece
+            except FlightAbandoned:
+                if emitted:
+                    raise
+                # The leader never got going; try again, possibly as the new leader
+                continue
+            generation.finish_reason = flight.finish_reason
+            return
+
+    def _room(self, generation, messages):
+        # Pre-flight count with the local tokenizer: what the context window leaves for the completion
+        estimate = count_messages(messages, generation.model)
+        return estimate, context_window(generation.model) - estimate
+
+    async def _open(self, generation, messages, max_tokens, estimate):
+        # Only now is anything billed: requests turned away by quota or admission stay out of the ledger
+        generation.source = OPENAI
+        # The local estimate is also kept next to the billed count in the ledger
+        generation.usage["estimated_prompt_tokens"] += estimate
+        # Never ask for more completion than the context window has left after the prompt
+        max_tokens = min(max_tokens, context_window(generation.model) - estimate)
+        return await self.hedger.open(lambda: self.retry.call(lambda: self.engine.stream(
+            model=generation.model,
+            messages=messages,
+            temperature=TEMPERATURE,
+            max_tokens=max_tokens,
+            stream_options={"include_usage": True},
+        )))
+
+    def _messages(self, generation, partial=None):
+        # Stable system prefix first, variable user text last, so the provider's prefix cache can hit
+        messages = [
+            {"role": "system", "content": generation.system_prompt},
+            {"role": "user", "content": generation.prompt}
+        ]
+        if partial:
+            messages += [
+                {"role": "assistant", "content": partial},
+                {"role": "user", "content": CONTINUE_PROMPT}
+            ]
+        return messages
+
+    async def _complete(self, generation):
+        budget = self.budgets.budget(generation.tool)
+        messages = self._messages(generation)
+        estimate, room = self._room(generation, messages)
+        if room < MIN_CONTINUATION_TOKENS:
+            raise PromptTooLarge(estimate, context_window(generation.model) - MIN_CONTINUATION_TOKENS)
+        started = time.monotonic()
+        text = ""
+        meta = {}
+        async for piece in stream_text(await self._open(generation, messages, budget, estimate), meta):
+            if not text:
+                self.router.record(generation.model, time.monotonic() - started)
+            text += piece
+            yield piece
+        self._record_usage(generation, meta.get("usage"))
+        completion_tokens = meta["usage"].completion_tokens if meta.get("usage") else 0
+        continuations = 0
+        while meta.get("finish_reason") == "length" and continuations < self.max_continuations:
+            messages = self._messages(generation, text)
+            estimate, room = self._room(generation, messages)
+            if room < MIN_CONTINUATION_TOKENS:
+                # The answer so far has filled the context window: return it as truncated
+                metrics.incr("continuations_out_of_room_total")
+                break
+            # Truncated: raise this category's budget once, then ask only for the missing tail
+            if not continuations:
+                budget = self.budgets.grow(generation.tool, budget)
+            continuations += 1
+            metrics.incr("continuations_total")
+            meta = {}
+            try:
+                async for piece in stitch(text, stream_text(await self._open(generation, messages, budget, estimate), meta)):
+                    text += piece
+                    yield piece
+            except Exception:
+                # A failed continuation still leaves a usable (truncated) answer; keep it
+                metrics.incr("continuation_failures_total")
+                meta = {"finish_reason": "length"}
+                break
+            self._record_usage(generation, meta.get("usage"))
+            completion_tokens += meta["usage"].completion_tokens if meta.get("usage") else 0
+        if meta.get("finish_reason") == "stop" and completion_tokens:
+            self.budgets.record(generation.tool, completion_tokens)
+        generation.finish_reason = meta.get("finish_reason")
+
+    def _record_usage(self, generation, usage):
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        generation.usage["prompt_tokens"] += usage.prompt_tokens
+        generation.usage["cached_tokens"] += cached
+        generation.usage["completion_tokens"] += usage.completion_tokens
+        metrics.incr("prompt_tokens_total", usage.prompt_tokens)
+        metrics.incr("cached_prompt_tokens_total", cached)
+        if metrics.counter("prompt_tokens_total"):
+            metrics.set_gauge("prompt_cache_hit_rate", metrics.counter("cached_prompt_tokens_total") / metrics.counter("prompt_tokens_total"))
+
+    def account(self, generation):
+        if self.ledger is None or generation.source is None:
+            return
+        self.ledger.record(generation.session_id, generation.tool, generation.model, generation.source, **generation.usage)
+
+    async def _lead(self, generation, key, flight):
+        text = ""
+        try:
+            decision = await asyncio.to_thread(self.quota.try_acquire, generation.fingerprint, generation.model)
+            if not decision.allowed:
+                raise QuotaExceeded(decision.reason)
+            try:
+                async with self.admission.admit(on_wait=generation.on_queue):
+                    async for piece in self._complete(generation):
+                        text += piece
+                        flight.publish(piece)
+                        yield piece
+            except (QueueFull, PromptTooLarge):
+                # Turned away before any request went out: the rate-limit tokens weren't spent either
+                await asyncio.to_thread(self.quota.refund, generation.fingerprint, generation.model)
+                raise
+            except Exception:
+                # Failed calls don't use up a free run
+                await asyncio.to_thread(self.quota.refund, generation.fingerprint)
+                raise
+            # Only complete answers are cached; truncated ones would be replayed forever
+            if generation.finish_reason == "stop":
+                await asyncio.to_thread(self.store, generation.prompt, text, generation.model, generation.system_prompt)
+            flight.finish(generation.finish_reason)
+        except (QuotaExceeded, QueueFull):
+            # The leader's own limits say nothing about the followers' chances
+            flight.abandon()
+            raise
+        except Exception as e:
+            flight.fail(e)
+            raise
+        except BaseException:
+            # Task cancelled or consumer went away: let a follower take over
+            flight.abandon()
+            raise
+        finally:
+            self.flights.forget(key, flight)
@@ -0,0 +1,126 @@
+import asyncio
+import os
+import threading
+import time
+import metrics
+
+
+async def _first_token(stream):
+    # Buffer chunks up to the first one carrying text (or the end), skipping role-only preambles
+    buffered = []
+    async for chunk in stream:
+        buffered.append(chunk)
+        if chunk.choices and (chunk.choices[0].delta.content or chunk.choices[0].finish_reason):
+            break
+    return buffered
+
+
+async def _close(stream):
+    close = getattr(stream, "close", None)
+    if close is not None:
+        try:
+            await close()
+        except Exception:
+            pass
+
+
+# ✅ Hedged requests: if the first token is late, race a second identical request
+class Hedger:
+    def __init__(self, enabled=False, budget=0.05, percentile=95, min_delay=1.0, max_delay=10.0, min_samples=20, name="openai"):
+        self.enabled = enabled
+        self.budget = budget
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.name = name
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._hedges = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            enabled=os.environ.get("OPENAI_HEDGE", "false").strip().lower() in ("1", "true", "yes", "on"),
+            budget=float(os.environ.get("OPENAI_HEDGE_BUDGET", 0.05)),
+            percentile=float(os.environ.get("OPENAI_HEDGE_PERCENTILE", 95)),
+            min_delay=float(os.environ.get("OPENAI_HEDGE_MIN_DELAY", 1)),
+            max_delay=float(os.environ.get("OPENAI_HEDGE_MAX_DELAY", 10)),
+        )
+
+    def threshold(self):
+        # Adapts to recent time-to-first-token; falls back to max_delay until there is enough history
+        ttft = metrics.samples(f"{self.name}_ttft_seconds")
+        if len(ttft) < self.min_samples:
+            return self.max_delay
+        return min(self.max_delay, max(self.min_delay, metrics.percentile(f"{self.name}_ttft_seconds", self.percentile)))
+
+    def _claim_hedge(self):
+        with self._lock:
+            if self._hedges >= self.budget * self._requests:
+                return False
+            self._hedges += 1
+            return True
+
+    async def open(self, open_stream):
+        # open_stream() starts one request and returns its async chunk stream; attempts race as tasks
+        with self._lock:
+            self._requests += 1
+        started = time.monotonic()
+
+        async def attempt():
+            stream = await open_stream()
+            try:
+                return stream, await _first_token(stream)
+            except BaseException:
+                await _close(stream)
+                raise
+
+        if not self.enabled:
+            stream, buffered = await attempt()
+            metrics.observe(f"{self.name}_ttft_seconds", time.monotonic() - started)
+            return self._chain(buffered, stream)
+
+        attempts = {asyncio.create_task(attempt()): "primary"}
+        winner, error = None, None
+        try:
+            done, _ = await asyncio.wait(attempts, timeout=self.threshold())
+            if not done and self._claim_hedge():
+                metrics.incr(f"{self.name}_hedges_total")
+                attempts[asyncio.create_task(attempt())] = "hedge"
+            pending = set(attempts)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        # One attempt failed; the other may still come through
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                    else:
+                        await _close(task.result()[0])
+        except BaseException:
+            if winner is not None:
+                await _close(winner.result()[0])
+            raise
+        finally:
+            # Lost the race (or nobody is waiting any more): cancelled attempts close their own stream
+            for task in attempts:
+                task.cancel()
+        if winner is None:
+            raise error
+        if attempts[winner] == "hedge":
+            metrics.incr(f"{self.name}_hedge_wins_total")
+        metrics.observe(f"{self.name}_ttft_seconds", time.monotonic() - started)
+        stream, buffered = winner.result()
+        return self._chain(buffered, stream)
+
+    async def _chain(self, buffered, stream):
+        # Iterating a provider stream again resumes where _first_token stopped
+        try:
+            for chunk in buffered:
+                yield chunk
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await _close(stream)
@@ -0,0 +1,217 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+INTERRUPTED = "The generation was interrupted. Please try again."
+
+# finish_reason "length" means the answer is truncated (out of continuations or context window)
+JobRecord = namedtuple("JobRecord", ["id", "fingerprint", "session_id", "tool", "prompt", "status", "text", "source", "error", "updated_at", "finish_reason"], defaults=(None,))
+
+
+class JobFailed(Exception):
+    pass
+
+
+# ✅ Persistent job store: finished (and in-progress) results outlive reruns, reconnects and reloads
+class JobStore:
+    def __init__(self, path, max_age=24 * 3600):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                session_id TEXT,
+                tool TEXT,
+                prompt TEXT NOT NULL,
+                status TEXT NOT NULL,
+                text TEXT NOT NULL,
+                source TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                finish_reason TEXT
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "finish_reason" not in columns:
+            # Job files written before finish_reason was stored
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN finish_reason TEXT")
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.environ.get("JOB_DB_PATH", ".cache/jobs.sqlite3"),
+            max_age=float(os.environ.get("JOB_MAX_AGE", 24 * 3600)),
+        )
+
+    def create(self, job_id, fingerprint, session_id, tool, prompt):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE updated_at < ?", (time.time() - self.max_age,)
+            )
+            self._conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, '', NULL, NULL, ?, NULL)",
+                (job_id, fingerprint, session_id, tool, prompt, RUNNING, time.time()),
+            )
+
+    def update(self, job_id, text, status=RUNNING, source=None, error=None, finish_reason=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET text = ?, status = ?, source = ?, error = ?, updated_at = ?, finish_reason = ? WHERE id = ?",
+                (text, status, source, error, time.time(), finish_reason, job_id),
+            )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, fingerprint, session_id, tool, prompt, status, text, source, error, updated_at, finish_reason FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return JobRecord(*row) if row else None
+
+
+class _Job:
+    def __init__(self, record):
+        self.record = record
+        self.pieces = []
+        self.status = RUNNING
+        self.source = None
+        self.error = None
+        self.finish_reason = None
+        self.position = None
+        self.changed = threading.Condition()
+
+
+# ✅ Background generation jobs: the run belongs to the server, sessions only follow it
+class JobRunner:
+    def __init__(self, generator, store, flush_interval=0.5, stale_after=120):
+        self.generator = generator
+        self.store = store
+        self.flush_interval = flush_interval
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self._live = {}
+
+    @classmethod
+    def from_env(cls, generator):
+        return cls(generator, JobStore.from_env())
+
+    def start(self, prompt, fingerprint, tool=None, session_id=None):
+        job_id = uuid.uuid4().hex
+        job = _Job(JobRecord(job_id, fingerprint, session_id, tool, prompt, RUNNING, "", None, None, time.time()))
+
+        def on_queue(position):
+            with job.changed:
+                job.position = position
+                job.changed.notify_all()
+
+        # Oversized prompts fail here, before a job (or a quota slot) exists
+        generation = self.generator.generate(prompt, fingerprint, tool=tool, on_queue=on_queue, session_id=session_id)
+        self.store.create(job_id, fingerprint, session_id, tool, prompt)
+        with self._lock:
+            self._live[job_id] = job
+        # A task on the engine loop, not a thread per job
+        self.generator.engine.submit(self._run(job, generation))
+        return job_id
+
+    def _append(self, job, piece):
+        with job.changed:
+            job.pieces.append(piece)
+            job.changed.notify_all()
+
+    async def _run(self, job, generation):
+        last_flush = time.monotonic()
+        try:
+            async for piece in generation:
+                self._append(job, piece)
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    await asyncio.to_thread(self.store.update, job.record.id, "".join(job.pieces))
+                    last_flush = time.monotonic()
+            status, error = DONE, None
+        except Exception as e:
+            status, error = FAILED, e
+        except BaseException:
+            # Cancelled, or the loop is shutting down: end the job here, or its followers would wait forever
+            self._finish(job, generation, FAILED, JobFailed(INTERRUPTED))
+            raise
+        await asyncio.to_thread(self._finish, job, generation, status, error)
+
+    def _finish(self, job, generation, status, error):
+        text = "".join(job.pieces)
+        try:
+            self.store.update(job.record.id, text, status, generation.source, str(error) if error else None, generation.finish_reason)
+        finally:
+            # Even if the store is unavailable, live followers must see the job end
+            with job.changed:
+                job.status, job.source, job.error = status, generation.source, error
+                job.finish_reason = generation.finish_reason
+                job.changed.notify_all()
+            with self._lock:
+                self._live.pop(job.record.id, None)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._live.get(job_id)
+        if job is not None:
+            with job.changed:
+                return job.record._replace(status=job.status, text="".join(job.pieces), source=job.source, finish_reason=job.finish_reason)
+        record = self.store.get(job_id)
+        if record is not None and record.status == RUNNING and time.time() - record.updated_at > self.stale_after:
+            # Not running here and not written to lately: the process that ran it is gone
+            return record._replace(status=FAILED, error=INTERRUPTED)
+        return record
+
+    def follow(self, job_id, on_queue=None):
+        # Everything generated so far, then new text as it arrives; raises if the job failed
+        with self._lock:
+            job = self._live.get(job_id)
+        if job is None:
+            yield from self._replay(job_id)
+            return
+        sent, position = 0, None
+        while True:
+            with job.changed:
+                while sent == len(job.pieces) and job.status == RUNNING and job.position == position:
+                    job.changed.wait()
+                pieces, status, error = job.pieces[sent:], job.status, job.error
+                queued = job.position
+            if queued != position:
+                position = queued
+                if on_queue is not None:
+                    on_queue(position)
+            sent += len(pieces)
+            yield from pieces
+            if status != RUNNING and sent == len(job.pieces):
+                break
+        if error is not None:
+            raise error
+
+    def _replay(self, job_id, poll=0.5):
+        # Jobs run by another process (or already finished): follow the store instead
+        sent = 0
+        while True:
+            record = self.get(job_id)
+            if record is None:
+                raise JobFailed("This generation has expired. Please try again.")
+            if len(record.text) > sent:
+                yield record.text[sent:]
+                sent = len(record.text)
+            if record.status == FAILED:
+                raise JobFailed(record.error)
+            if record.status == DONE:
+                return
+            time.sleep(poll)
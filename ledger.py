@@ -0,0 +1,92 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+
+# ✅ USD per 1M tokens: (input, cached input, output)
+PRICES = {
+    "gpt-4": (30.0, 30.0, 60.0),
+    "gpt-4-turbo": (10.0, 10.0, 30.0),
+    "gpt-4o": (2.5, 1.25, 10.0),
+    "gpt-4o-mini": (0.15, 0.075, 0.6),
+}
+
+def caches_prompts(model):
+    # Only models billed less for cached input tokens make a long shared prefix pay off
+    prices = PRICES.get(model)
+    return prices is not None and prices[1] < prices[0]
+
+
+GROUPS = ("day", "tool", "model", "session_id", "source")
+
+
+def cost(model, prompt_tokens, completion_tokens, cached_tokens=0):
+    input_price, cached_price, output_price = PRICES.get(model, PRICES["gpt-4"])
+    uncached = max(0, prompt_tokens - cached_tokens)
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1_000_000
+
+
+# ✅ Append-only token/cost ledger, one row per generation
+class UsageLedger:
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS usage (
+                ts REAL NOT NULL,
+                day TEXT NOT NULL,
+                session_id TEXT,
+                tool TEXT,
+                model TEXT NOT NULL,
+                source TEXT NOT NULL,
+                estimated_prompt_tokens INTEGER NOT NULL,
+                prompt_tokens INTEGER NOT NULL,
+                cached_tokens INTEGER NOT NULL,
+                completion_tokens INTEGER NOT NULL,
+                cost_usd REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS usage_day ON usage (day)")
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.environ.get("USAGE_LEDGER_PATH", ".cache/usage.sqlite3"))
+
+    def record(self, session_id, tool, model, source, estimated_prompt_tokens=0, prompt_tokens=0, cached_tokens=0, completion_tokens=0):
+        now = time.time()
+        day = datetime.fromtimestamp(now, timezone.utc).strftime("%Y-%m-%d")
+        row = (
+            now, day, session_id, tool, model, source,
+            estimated_prompt_tokens, prompt_tokens, cached_tokens, completion_tokens,
+            cost(model, prompt_tokens, completion_tokens, cached_tokens),
+        )
+        with self._lock:
+            self._conn.execute("INSERT INTO usage VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+
+    def totals(self, group="day", since_day=None, limit=100):
+        if group not in GROUPS:
+            raise ValueError(f"group must be one of {GROUPS}")
+        query = f"""
+            SELECT {group}, COUNT(*), SUM(estimated_prompt_tokens), SUM(prompt_tokens), SUM(cached_tokens), SUM(completion_tokens), SUM(cost_usd)
+            FROM usage WHERE day >= ? GROUP BY {group} ORDER BY SUM(cost_usd) DESC, {group} LIMIT ?
+        """
+        with self._lock:
+            rows = self._conn.execute(query, (since_day or "", limit)).fetchall()
+        return [
+            {
+                group: key,
+                "requests": requests,
+                "estimated_prompt_tokens": estimated_prompt_tokens,
+                "prompt_tokens": prompt_tokens,
+                "cached_tokens": cached_tokens,
+                "completion_tokens": completion_tokens,
+                "cost_usd": round(cost_usd, 4),
+            }
+            for key, requests, estimated_prompt_tokens, prompt_tokens, cached_tokens, completion_tokens, cost_usd in rows
+        ]
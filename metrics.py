@@ -0,0 +1,56 @@
+import threading
+from collections import defaultdict, deque
+
+
+# ✅ Process-wide in-memory metrics: counters, gauges and recent-sample windows
+WINDOW = 500
+
+_lock = threading.Lock()
+_counters = defaultdict(float)
+_gauges = {}
+_samples = defaultdict(lambda: deque(maxlen=WINDOW))
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+
+
+def counter(name):
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def observe(name, value):
+    with _lock:
+        _samples[name].append(value)
+
+
+def samples(name):
+    with _lock:
+        return list(_samples.get(name, ()))
+
+
+def percentile(name, q, default=None):
+    values = sorted(samples(name))
+    if not values:
+        return default
+    index = min(len(values) - 1, int(q / 100 * len(values)))
+    return values[index]
+
+
+def snapshot():
+    with _lock:
+        counters = dict(_counters)
+        gauges = dict(_gauges)
+        names = list(_samples)
+    summaries = {
+        name: {"count": len(samples(name)), "p50": percentile(name, 50), "p95": percentile(name, 95), "p99": percentile(name, 99)}
+        for name in names
+    }
+    return {"counters": counters, "gauges": gauges, "summaries": summaries}
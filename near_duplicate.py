@@ -0,0 +1,157 @@
+import hashlib
+import os
+import random
+import re
+import threading
+from collections import OrderedDict, defaultdict
+
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+_NUMBER_WORDS = {
+    "zero": "0", "one": "1", "two": "2", "three": "3", "four": "4", "five": "5",
+    "six": "6", "seven": "7", "eight": "8", "nine": "9", "ten": "10",
+    "eleven": "11", "twelve": "12", "thirteen": "13", "fourteen": "14", "fifteen": "15",
+    "sixteen": "16", "seventeen": "17", "eighteen": "18", "nineteen": "19", "twenty": "20",
+}
+
+
+# ✅ Prompt normalization: case, punctuation, whitespace and spelled-out numbers
+def normalize(prompt):
+    words = re.sub(r"[^\w\s]", " ", prompt.lower()).split()
+    return " ".join(_NUMBER_WORDS.get(word, word) for word in words)
+
+
+# Words that never change what is being asked for; "without", "not", "no" and "or" are not among them
+_STOPWORDS = frozenset("""
+    a an the this that these those it its i me my we our you your
+    to for of in on at by from into with and using use please can could would should
+    some is are be
+""".split())
+
+
+def content_words(normalized):
+    # "EC2" vs "ECS", "with" vs "without" and "2" vs "3" shingle almost identically but need
+    # different answers: only prompts with the same content words may share one
+    return frozenset(word for word in normalized.split() if word not in _STOPWORDS)
+
+
+def _words_digest(words):
+    return hashlib.blake2b("\n".join(sorted(words)).encode("utf-8"), digest_size=16).digest()
+
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second) if first or second else 1.0
+
+
+def shingles(normalized, size=5):
+    if len(normalized) <= size:
+        return {normalized}
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+# ✅ In-memory MinHash/LSH index over cached prompts: a signature and a digest per entry, while the
+# prompts themselves stay in SQLite, so memory doesn't grow with prompt length
+class MinHashIndex:
+    def __init__(self, num_perm=32, bands=8, threshold=0.85, max_entries=5000, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_entries = max_entries
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+        self._entries = OrderedDict()
+        self._buckets = defaultdict(set)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            num_perm=int(os.environ.get("NEAR_DUPLICATE_NUM_PERM", 32)),
+            bands=int(os.environ.get("NEAR_DUPLICATE_BANDS", 8)),
+            threshold=float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", 0.85)),
+            max_entries=int(os.environ.get("NEAR_DUPLICATE_MAX_ENTRIES", 5000)),
+        )
+
+    def signature(self, normalized):
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+            for shingle in shingles(normalized)
+        ]
+        return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._perms)
+
+    def _band_keys(self, context, signature):
+        for band in range(self.bands):
+            yield (context, band, signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, key, context, prompt):
+        normalized = normalize(prompt)
+        signature = self.signature(normalized)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (context, signature, _words_digest(content_words(normalized)))
+            for band_key in self._band_keys(context, signature):
+                self._buckets[band_key].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def remove(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        context, signature = entry[:2]
+        for band_key in self._band_keys(context, signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def query(self, context, prompt, load):
+        # Returns (key, similarity) for the best match above threshold, else None. MinHash only
+        # finds candidates; the exact Jaccard on the stored prompt (load(key), None if gone) decides,
+        # since a 32-permutation estimate runs high
+        normalized = normalize(prompt)
+        signature = self.signature(normalized)
+        wanted_words = content_words(normalized)
+        wanted_digest = _words_digest(wanted_words)
+        with self._lock:
+            candidates = set()
+            for band_key in self._band_keys(context, signature):
+                candidates.update(self._buckets.get(band_key, ()))
+            candidates = [key for key in candidates if self._entries[key][2] == wanted_digest]
+        wanted_shingles = shingles(normalized)
+        best = None
+        for key in candidates:
+            stored = load(key)
+            if stored is None:
+                continue
+            other = normalize(stored)
+            if content_words(other) != wanted_words:
+                continue
+            similarity = jaccard(wanted_shingles, shingles(other))
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (key, similarity)
+        if best is not None:
+            with self._lock:
+                if best[0] in self._entries:
+                    self._entries.move_to_end(best[0])
+        return best
+
+    def rebuild(self, entries):
+        # entries: iterable of (key, context, prompt), least recently used first
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+        for key, context, prompt in entries:
+            self.add(key, context, prompt)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,45 @@
+import hmac
+import os
+from datetime import datetime, timedelta, timezone
+import streamlit as st
+import metrics
+from ledger import UsageLedger
+
+# ✅ Config
+st.set_page_config(page_title="Codeweave Admin", page_icon="🔐", layout="wide")
+st.title("🔐 Usage & Cost")
+
+# ✅ Access (disabled unless ADMIN_PASSWORD is set)
+password = os.environ.get("ADMIN_PASSWORD")
+if not password:
+    st.info("The admin page is disabled. Set ADMIN_PASSWORD to enable it.")
+    st.stop()
+if not hmac.compare_digest(st.text_input("Password", type="password").encode(), password.encode()):
+    st.stop()
+
+# ✅ Ledger
+@st.cache_resource
+def get_ledger():
+    return UsageLedger.from_env()
+
+ledger = get_ledger()
+
+days = st.slider("Days", min_value=1, max_value=90, value=7)
+since = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+
+by_day = ledger.totals("day", since)
+col1, col2, col3 = st.columns(3)
+col1.metric("Requests", sum(row["requests"] for row in by_day))
+col2.metric("Tokens", sum(row["prompt_tokens"] + row["completion_tokens"] for row in by_day))
+col3.metric("Cost (USD)", f"${sum(row['cost_usd'] for row in by_day):.2f}")
+
+st.subheader("📅 Per day")
+st.dataframe(sorted(by_day, key=lambda row: row["day"], reverse=True), use_container_width=True)
+
+for title, group in [("🔧 Per tool", "tool"), ("🧠 Per model", "model"), ("⚡ Per source", "source"), ("👤 Top sessions", "session_id")]:
+    st.subheader(title)
+    st.dataframe(ledger.totals(group, since, limit=50), use_container_width=True)
+
+# ✅ Live process metrics (this server process only)
+with st.expander("📈 Process metrics"):
+    st.json(metrics.snapshot())
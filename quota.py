@@ -0,0 +1,159 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+
+Decision = namedtuple("Decision", ["allowed", "reason", "remaining"])
+
+DAILY = "daily"
+RATE = "rate"
+GLOBAL = "global"
+
+
+def utc_day():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def client_address(forwarded_for, peer, trusted_hops=None):
+    # X-Forwarded-For is client-controlled except for what our own proxies appended on the right:
+    # with N trusted hops, the Nth entry from the right is the address the outermost proxy saw
+    if trusted_hops is None:
+        trusted_hops = int(os.environ.get("TRUSTED_PROXY_HOPS", 1))
+    entries = [entry.strip() for entry in (forwarded_for or "").split(",") if entry.strip()]
+    if trusted_hops > 0 and len(entries) >= trusted_hops:
+        return entries[-trusted_hops]
+    return peer or ""
+
+
+def fingerprint(identity):
+    # The address (or API key) alone: anything else the client sends, like its User-Agent,
+    # it could change to start over with a fresh quota
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+
+# ✅ Cross-process quota: daily free runs + per-client token bucket + global per-model ceiling
+class QuotaStore:
+    def __init__(self, path, daily_limit=5, burst=2, refill_seconds=30, global_per_minute=20):
+        self.daily_limit = daily_limit
+        self.burst = burst
+        self.refill_seconds = refill_seconds
+        self.global_per_minute = global_per_minute
+        self._lock = threading.Lock()
+        self._pruned_day = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # SQLite's own file locking makes every transaction below safe across processes
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS daily (
+                fingerprint TEXT NOT NULL,
+                day TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (fingerprint, day)
+            )
+        """)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.environ.get("QUOTA_DB_PATH", ".cache/quota.sqlite3"),
+            daily_limit=int(os.environ.get("QUOTA_DAILY_LIMIT", 5)),
+            burst=float(os.environ.get("QUOTA_BURST", 2)),
+            refill_seconds=float(os.environ.get("QUOTA_REFILL_SECONDS", 30)),
+            global_per_minute=float(os.environ.get("GLOBAL_REQUESTS_PER_MINUTE", 20)),
+        )
+
+    def _used_today(self, fingerprint, day):
+        row = self._conn.execute(
+            "SELECT count FROM daily WHERE fingerprint = ? AND day = ?", (fingerprint, day)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _bucket(self, name, capacity, rate, now):
+        row = self._conn.execute("SELECT tokens, updated_at FROM buckets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return capacity
+        tokens, updated_at = row
+        return min(capacity, tokens + (now - updated_at) * rate)
+
+    def _save_bucket(self, name, tokens, now):
+        self._conn.execute("INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)", (name, tokens, now))
+
+    def remaining(self, fingerprint):
+        with self._lock:
+            return max(0, self.daily_limit - self._used_today(fingerprint, utc_day()))
+
+    def try_acquire(self, fingerprint, model):
+        now = time.time()
+        day = utc_day()
+        client_key = f"client:{fingerprint}"
+        global_key = f"global:{model}"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._pruned_day != day:
+                    self._conn.execute("DELETE FROM daily WHERE day != ?", (day,))
+                    # Idle client buckets have refilled completely; a missing row means the same thing
+                    self._conn.execute(
+                        "DELETE FROM buckets WHERE name LIKE 'client:%' AND updated_at < ?",
+                        (now - self.burst * self.refill_seconds,),
+                    )
+                    self._pruned_day = day
+                used = self._used_today(fingerprint, day)
+                if used >= self.daily_limit:
+                    self._conn.execute("ROLLBACK")
+                    return Decision(False, DAILY, 0)
+                client_tokens = self._bucket(client_key, self.burst, 1 / self.refill_seconds, now)
+                if client_tokens < 1:
+                    self._conn.execute("ROLLBACK")
+                    return Decision(False, RATE, self.daily_limit - used)
+                global_tokens = self._bucket(global_key, self.global_per_minute, self.global_per_minute / 60, now)
+                if global_tokens < 1:
+                    self._conn.execute("ROLLBACK")
+                    return Decision(False, GLOBAL, self.daily_limit - used)
+                self._save_bucket(client_key, client_tokens - 1, now)
+                self._save_bucket(global_key, global_tokens - 1, now)
+                self._conn.execute(
+                    "INSERT INTO daily VALUES (?, ?, 1) ON CONFLICT (fingerprint, day) DO UPDATE SET count = count + 1",
+                    (fingerprint, day),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return Decision(True, None, self.daily_limit - used - 1)
+
+    def refund(self, fingerprint, model=None):
+        # Give the daily run back when the OpenAI call failed; with `model`, no call went out at all
+        # (e.g. the queue was full), so the client and global bucket tokens go back too
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "UPDATE daily SET count = MAX(0, count - 1) WHERE fingerprint = ? AND day = ?",
+                    (fingerprint, utc_day()),
+                )
+                if model is not None:
+                    for name, capacity, rate in (
+                        (f"client:{fingerprint}", self.burst, 1 / self.refill_seconds),
+                        (f"global:{model}", self.global_per_minute, self.global_per_minute / 60),
+                    ):
+                        self._save_bucket(name, min(capacity, self._bucket(name, capacity, rate, now) + 1), now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+# ✅ Cache key helpers
+def normalize_prompt(prompt):
+    return " ".join(prompt.split())
+
+
+def _digest(parts):
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def context_key(namespace, model, system_prompt, temperature, max_tokens):
+    # Everything except the user prompt; entries are only interchangeable within one context
+    return _digest([namespace, model, system_prompt, temperature, max_tokens])
+
+
+def cache_key(namespace, model, system_prompt, prompt, temperature, max_tokens):
+    return _digest([namespace, model, system_prompt, normalize_prompt(prompt), temperature, max_tokens])
+
+
+# ✅ SQLite-backed response cache with TTL and size-bounded LRU eviction
+class ResponseCache:
+    def __init__(self, path, ttl=7 * 24 * 3600, max_bytes=50 * 1024 * 1024, namespace="v1"):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                context TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (accessed_at)")
+        # Entries written under an older version namespace are never read again
+        self._conn.execute("DELETE FROM responses WHERE namespace != ?", (namespace,))
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            os.environ.get("RESPONSE_CACHE_PATH", ".cache/responses.sqlite3"),
+            ttl=float(os.environ.get("RESPONSE_CACHE_TTL", 7 * 24 * 3600)),
+            max_bytes=int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 50 * 1024 * 1024)),
+            namespace=os.environ.get("RESPONSE_CACHE_VERSION", "v1"),
+        )
+
+    def key_for(self, model, system_prompt, prompt, temperature, max_tokens):
+        return cache_key(self.namespace, model, system_prompt, prompt, temperature, max_tokens)
+
+    def context_for(self, model, system_prompt, temperature, max_tokens):
+        return context_key(self.namespace, model, system_prompt, temperature, max_tokens)
+
+    def get(self, model, system_prompt, prompt, temperature, max_tokens):
+        return self.get_by_key(self.key_for(model, system_prompt, prompt, temperature, max_tokens))
+
+    def get_by_key(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return response
+
+    def prompt_for(self, key):
+        # The (whitespace-normalized) prompt an entry was stored under, or None
+        with self._lock:
+            row = self._conn.execute("SELECT prompt FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, model, system_prompt, prompt, temperature, max_tokens, response):
+        key = self.key_for(model, system_prompt, prompt, temperature, max_tokens)
+        context = self.context_for(model, system_prompt, temperature, max_tokens)
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return key
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, self.namespace, context, normalize_prompt(prompt), response, size, now, now),
+            )
+            self._evict(now)
+        return key
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            victims.append((key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+
+    def iter_entries(self, limit):
+        # (key, context, prompt) for the most recently used live entries, oldest first
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, context, prompt FROM responses WHERE created_at >= ? ORDER BY accessed_at DESC LIMIT ?",
+                (time.time() - self.ttl, limit),
+            ).fetchall()
+        return reversed(rows)
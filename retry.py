@@ -0,0 +1,127 @@
+import asyncio
+import os
+import random
+import re
+import time
+from email.utils import parsedate_to_datetime
+import openai
+import metrics
+
+
+RETRYABLE = "retryable"
+FATAL = "fatal"
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class ProviderUnavailable(Exception):
+    # Retryable failures that outlasted the retry budget
+    pass
+
+
+# ✅ Error classification
+def classify(error):
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return RETRYABLE
+    if isinstance(error, openai.APIStatusError):
+        if getattr(error, "code", None) == "insufficient_quota":
+            # A 429 that no amount of waiting will fix
+            return FATAL
+        return RETRYABLE if error.status_code in RETRYABLE_STATUS else FATAL
+    return FATAL
+
+
+# ✅ Server-provided backoff hints (Retry-After and x-ratelimit-* headers)
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value):
+    # OpenAI reset headers look like "20ms", "1s" or "6m0s"
+    parts = _DURATION.findall(value or "")
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    if headers.get("retry-after"):
+        value = headers["retry-after"]
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    waits = []
+    if headers.get("x-ratelimit-remaining-requests") == "0":
+        waits.append(parse_duration(headers.get("x-ratelimit-reset-requests")))
+    if headers.get("x-ratelimit-remaining-tokens") == "0":
+        waits.append(parse_duration(headers.get("x-ratelimit-reset-tokens")))
+    waits = [wait for wait in waits if wait is not None]
+    return max(waits) if waits else None
+
+
+# ✅ Retry with full-jitter exponential backoff, bounded by a total deadline
+class RetryPolicy:
+    def __init__(self, max_attempts=4, base_delay=0.5, max_delay=8.0, deadline=20.0, name="openai"):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.name = name
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_attempts=int(os.environ.get("OPENAI_RETRY_ATTEMPTS", 4)),
+            base_delay=float(os.environ.get("OPENAI_RETRY_BASE_DELAY", 0.5)),
+            max_delay=float(os.environ.get("OPENAI_RETRY_MAX_DELAY", 8)),
+            deadline=float(os.environ.get("OPENAI_RETRY_DEADLINE", 20)),
+        )
+
+    def delay(self, attempt, error):
+        hinted = retry_after(error)
+        if hinted is not None:
+            # Honour the server's hint, with a little jitter so waiters don't stampede together
+            return hinted + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(self, fn):
+        # fn() returns a coroutine; backoff suspends the task instead of sleeping a thread
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            attempt_started = time.monotonic()
+            metrics.incr(f"{self.name}_attempts_total")
+            try:
+                result = await fn()
+            except Exception as e:
+                metrics.observe(f"{self.name}_attempt_seconds", time.monotonic() - attempt_started)
+                kind = classify(e)
+                metrics.incr(f"{self.name}_errors_{kind}_total")
+                if kind == FATAL:
+                    raise
+                wait = self.delay(attempt, e)
+                elapsed = time.monotonic() - started
+                if attempt >= self.max_attempts or elapsed + wait > self.deadline:
+                    metrics.incr(f"{self.name}_retries_exhausted_total")
+                    raise ProviderUnavailable(f"OpenAI is busy or unreachable after {attempt} attempt(s): {e}") from e
+                metrics.incr(f"{self.name}_retries_total")
+                await asyncio.sleep(wait)
+                continue
+            metrics.observe(f"{self.name}_attempt_seconds", time.monotonic() - attempt_started)
+            metrics.observe(f"{self.name}_call_seconds", time.monotonic() - started)
+            metrics.observe(f"{self.name}_attempts_per_call", attempt)
+            return result
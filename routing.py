@@ -0,0 +1,101 @@
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+import metrics
+
+
+FAST = "fast"
+STRONG = "strong"
+
+# ✅ Routing table: template category → preferred tier
+ROUTES = {
+    "Terraform": STRONG,
+    "Docker": FAST,
+    "CI/CD (GitHub Actions)": FAST,
+    "Kubernetes": FAST,
+    "Monitoring (Prometheus)": FAST,
+    "IAM Policies": FAST,
+    "Helm Charts": STRONG,
+    "AWS": FAST,
+    "GCP": STRONG,
+    "Azure": FAST,
+    "GenAI App Templates": STRONG,
+    "Other": STRONG,
+}
+
+# Words that usually mean a multi-resource or multi-file artifact
+_COMPLEX_HINTS = re.compile(
+    r"\b(module|modules|multi|multiple|cluster|clusters|production|end-to-end|vpc|network|autoscal\w*|"
+    r"blue/green|canary|ha|highly available|migrat\w*|refactor|chart|charts|pipeline|terraform)\b",
+    re.IGNORECASE,
+)
+
+
+def is_complex(prompt, max_words=60, max_hints=2):
+    # Long prompts, pasted code and several heavyweight nouns all point at the big model
+    if len(prompt.split()) > max_words or prompt.count("\n") > 10:
+        return True
+    return len(_COMPLEX_HINTS.findall(prompt)) > max_hints
+
+
+# ✅ Latency-aware router with automatic fallback when a model breaches its SLO
+class Router:
+    def __init__(self, models, routes=ROUTES, slo=8.0, window=300, min_samples=5, percentile=90, enabled=True):
+        self.models = models
+        self.routes = routes
+        self.slo = slo
+        self.window = window
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._latencies = defaultdict(lambda: deque(maxlen=200))
+
+    @classmethod
+    def from_env(cls, default_model):
+        models = {
+            FAST: os.environ.get("ROUTER_FAST_MODEL", "gpt-4o-mini"),
+            STRONG: os.environ.get("ROUTER_STRONG_MODEL", default_model),
+        }
+        return cls(
+            models,
+            slo=float(os.environ.get("ROUTER_TTFT_SLO", 8)),
+            window=float(os.environ.get("ROUTER_WINDOW_SECONDS", 300)),
+            enabled=os.environ.get("ROUTER_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on"),
+        )
+
+    def chain(self, tool, prompt):
+        tier = self.routes.get(tool, STRONG)
+        if tier == FAST and is_complex(prompt):
+            tier = STRONG
+        other = FAST if tier == STRONG else STRONG
+        return [self.models[tier], self.models[other]]
+
+    def choose(self, tool, prompt):
+        if not self.enabled:
+            return self.models[STRONG]
+        chain = self.chain(tool, prompt)
+        for model in chain:
+            if self.healthy(model):
+                return model
+        # Everything is slow: stick with the preferred model
+        return chain[0]
+
+    def record(self, model, ttft):
+        metrics.observe(f"model_ttft_seconds:{model}", ttft)
+        with self._lock:
+            self._latencies[model].append((time.monotonic(), ttft))
+
+    def healthy(self, model):
+        # Only recent samples count, so a demoted model is retried once its bad window ages out
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            recent = sorted(ttft for at, ttft in self._latencies[model] if at >= cutoff)
+        if len(recent) < self.min_samples:
+            return True
+        p = recent[min(len(recent) - 1, int(self.percentile / 100 * len(recent)))]
+        healthy = p <= self.slo
+        metrics.set_gauge(f"model_healthy:{model}", int(healthy))
+        return healthy
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import metrics
+
+
+class FlightAbandoned(Exception):
+    # The leader gave up without an answer (quota, full queue, interrupted script run)
+    pass
+
+
+# ✅ One in-flight call shared by a leader and any number of followers
+class Flight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chunks = []
+        self._done = False
+        self._error = None
+        # (loop, asyncio.Event) of followers reading stream()
+        self._wakers = set()
+        self.finish_reason = None
+
+    def _notify(self):
+        # Under the lock: wake every follower, on whichever loop it runs
+        for loop, event in self._wakers:
+            loop.call_soon_threadsafe(event.set)
+
+    def publish(self, text):
+        with self._lock:
+            self._chunks.append(text)
+            self._notify()
+
+    def finish(self, finish_reason):
+        with self._lock:
+            self.finish_reason = finish_reason
+            self._done = True
+            self._notify()
+
+    def fail(self, error):
+        with self._lock:
+            self._error = error
+            self._done = True
+            self._notify()
+
+    def abandon(self):
+        self.fail(FlightAbandoned("the identical request this one was sharing stopped before finishing"))
+
+    async def stream(self):
+        # Replays everything published so far, then follows the leader live; waiting suspends the task
+        index = 0
+        waker = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._wakers.add(waker)
+        try:
+            while True:
+                with self._lock:
+                    waker[1].clear()
+                    pending = self._chunks[index:]
+                    done, error = self._done, self._error
+                if not pending and not done:
+                    await waker[1].wait()
+                    continue
+                for piece in pending:
+                    yield piece
+                index += len(pending)
+                if done and index == len(self._chunks):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            with self._lock:
+                self._wakers.discard(waker)
+
+
+# ✅ Coalesces identical concurrent requests onto one Flight
+class SingleFlight:
+    def __init__(self, name="generation"):
+        self.name = name
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def join(self, key):
+        # Returns (flight, is_leader)
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                metrics.incr(f"{self.name}_coalesced_total")
+                return flight, False
+            flight = self._flights[key] = Flight()
+            return flight, True
+
+    def forget(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
@@ -0,0 +1,80 @@
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+
+# Modules live at the repository root, next to app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tokens  # noqa: E402
+from admission import AdmissionController  # noqa: E402
+from engine import Engine  # noqa: E402
+from generation import Generator  # noqa: E402
+from near_duplicate import MinHashIndex  # noqa: E402
+from quota import QuotaStore  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+
+class FakeEncoding:
+    # Four characters per token, lossless, so the suite never downloads a BPE file
+    def encode(self, text, disallowed_special=()):
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+@pytest.fixture(autouse=True)
+def offline_encoding(monkeypatch):
+    monkeypatch.setattr(tokens, "get_encoding", lambda model: FakeEncoding())
+
+
+def chunk(content=None, finish_reason=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish_reason)] if content or finish_reason else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+def usage(prompt_tokens=10, completion_tokens=2):
+    return SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, prompt_tokens_details=None)
+
+
+class FakeStream:
+    # Like openai.AsyncStream: every async for resumes the same underlying iterator
+    def __init__(self, chunks, delay=0.0):
+        self._iterator = self._chunks(chunks, delay)
+        self.closed = False
+
+    @staticmethod
+    async def _chunks(chunks, delay):
+        for item in chunks:
+            await asyncio.sleep(delay)
+            yield item
+
+    async def __aiter__(self):
+        async for item in self._iterator:
+            yield item
+
+    async def close(self):
+        self.closed = True
+        await self._iterator.aclose()
+
+
+@pytest.fixture
+def make_generator(tmp_path):
+    # A Generator on its own engine, whose async client is `client`
+    engines = []
+
+    def make(client, admission=None, **options):
+        engines.append(Engine(client_factory=lambda: client))
+        return Generator(
+            engines[-1],
+            ResponseCache(str(tmp_path / "responses.sqlite3")),
+            MinHashIndex(),
+            QuotaStore(str(tmp_path / "quota.sqlite3")),
+            admission or AdmissionController(),
+            **options,
+        )
+    yield make
+    for engine in engines:
+        engine.close()
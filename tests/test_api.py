@@ -0,0 +1,37 @@
+from starlette.testclient import TestClient
+from api import create_app
+from generation import PromptTooLarge
+
+
+class RecordingGenerator:
+    # Records who asked, then stops before anything runs
+    def __init__(self):
+        self.fingerprints = []
+
+    def generate(self, prompt, fingerprint, **kwargs):
+        self.fingerprints.append(fingerprint)
+        raise PromptTooLarge(1, 0)
+
+
+def test_user_agent_does_not_change_the_quota_key(monkeypatch):
+    monkeypatch.delenv("API_KEYS", raising=False)
+    generator = RecordingGenerator()
+    client = TestClient(create_app(generator))
+    for user_agent in ("curl/8.0", "python-httpx/0.28", "anything-else"):
+        response = client.post(
+            "/v1/generate",
+            json={"prompt": "Dockerfile for a Flask app"},
+            headers={"User-Agent": user_agent, "X-Forwarded-For": "198.51.100.4"},
+        )
+        assert response.status_code == 413
+    assert len(set(generator.fingerprints)) == 1
+
+
+def test_each_api_key_has_its_own_quota(monkeypatch):
+    monkeypatch.setenv("API_KEYS", "first,second")
+    generator = RecordingGenerator()
+    client = TestClient(create_app(generator))
+    for key in ("first", "second", "first"):
+        client.post("/v1/generate", json={"prompt": "x"}, headers={"Authorization": f"Bearer {key}", "User-Agent": key * 2})
+    assert generator.fingerprints[0] == generator.fingerprints[2] != generator.fingerprints[1]
+    assert client.post("/v1/generate", json={"prompt": "x"}, headers={"Authorization": "Bearer nope"}).status_code == 401
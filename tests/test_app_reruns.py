@@ -0,0 +1,132 @@
+import os
+from collections import Counter
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+import engine
+import generation
+import jobs
+import visitors
+from generation import Compaction, OPENAI
+from jobs import DONE, JobRecord
+
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+# What app.py calls, counted: prepare() runs once per script run (in prompt_inputs)
+calls = Counter()
+
+
+class FakeQuota:
+    daily_limit = 5
+
+    def remaining(self, fingerprint):
+        return self.daily_limit
+
+
+class FakeGenerator:
+    max_prompt_tokens = 3000
+    trim_prompts = False
+
+    def __init__(self):
+        self.quota = FakeQuota()
+
+    def prepare(self, prompt, tool=None):
+        calls["prepare"] += 1
+        tokens = len(prompt.split())
+        return Compaction(prompt, "gpt-4", tokens, tokens)
+
+
+class FakeJobRunner:
+    finish_reason = "stop"
+
+    def __init__(self):
+        self.records = {}
+
+    def start(self, prompt, fingerprint, tool=None, session_id=None):
+        calls["start"] += 1
+        job_id = f"job{calls['start']}"
+        self.records[job_id] = JobRecord(job_id, fingerprint, session_id, tool, prompt, DONE, "FROM python:3.12-slim", OPENAI, None, 0, self.finish_reason)
+        return job_id
+
+    def follow(self, job_id, on_queue=None):
+        yield self.records[job_id].text
+
+    def get(self, job_id):
+        return self.records.get(job_id)
+
+
+class FakeVisitorStats:
+    def start(self):
+        return self
+
+    def snapshot(self):
+        return visitors.EMPTY_SNAPSHOT
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.delenv("API_PORT", raising=False)
+    monkeypatch.setenv("ARTIFACT_DIR", str(tmp_path / "artifacts"))
+    monkeypatch.setattr(engine, "Engine", lambda: None)
+    monkeypatch.setattr(generation.Generator, "from_env", classmethod(lambda cls, engine: FakeGenerator()))
+    monkeypatch.setattr(jobs.JobRunner, "from_env", classmethod(lambda cls, generator: FakeJobRunner()))
+    monkeypatch.setattr(visitors.VisitorStats, "from_env", classmethod(lambda cls: FakeVisitorStats()))
+    st.cache_resource.clear()
+    calls.clear()
+    at = AppTest.from_file(APP, default_timeout=30)
+    at.run()
+    assert not at.exception
+    yield at
+    st.cache_resource.clear()
+
+
+def test_generate_click_runs_the_script_once_plus_one_refresh(app):
+    # AppTest replays a click inside a fragment as a full script run, so count script runs: the click
+    # itself (no st.rerun() round-trip after the callback), then one rerun once the answer is in
+    before = calls.copy()
+    app.button(key="generate").click().run()
+    assert not app.exception
+    assert calls["start"] - before["start"] == 1
+    assert calls["prepare"] - before["prepare"] == 2
+    assert app.session_state["code_result"] == "FROM python:3.12-slim"
+    assert not app.session_state["is_generating"]
+
+
+def test_sidebar_shows_the_last_run_after_a_generation(app):
+    assert not any("Last Used" in markdown.value for markdown in app.sidebar.markdown)
+    app.button(key="generate").click().run()
+    assert any("Last Used" in markdown.value for markdown in app.sidebar.markdown)
+
+
+def test_each_click_starts_exactly_one_generation(app):
+    for clicks in range(1, 4):
+        app.button(key="generate").click().run()
+        assert not app.exception
+        assert calls["start"] == clicks
+
+
+def test_out_of_free_runs_can_still_generate(app, monkeypatch):
+    # Cache and coalesced hits cost nothing; the job itself reports QuotaExceeded when it needs a run
+    monkeypatch.setattr(FakeQuota, "daily_limit", 0)
+    app.run()
+    app.button(key="generate").click().run()
+    assert not app.exception
+    assert calls["start"] == 1
+    assert app.session_state["code_result"] == "FROM python:3.12-slim"
+
+
+def test_truncated_answers_are_flagged(app, monkeypatch):
+    app.button(key="generate").click().run()
+    assert not app.warning
+    monkeypatch.setattr(FakeJobRunner, "finish_reason", "length")
+    app.button(key="generate").click().run()
+    assert app.session_state["code_truncated"]
+    assert any("truncated" in warning.value for warning in app.warning)
+
+
+def test_download_bytes_are_built_only_on_click(app, tmp_path):
+    app.button(key="generate").click().run()
+    (button,) = app.get("download_button")
+    assert button.proto.deferred_file_id and button.proto.ignore_rerun
+    assert not os.listdir(tmp_path / "artifacts")
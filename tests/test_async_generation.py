@@ -0,0 +1,133 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+import metrics
+from admission import AdmissionController
+from conftest import FakeStream, chunk, usage
+from generation import COALESCED, OPENAI
+from jobs import DONE, FAILED, INTERRUPTED, JobFailed, JobRunner, JobStore
+
+
+class AsyncClient:
+    def __init__(self, pieces=("Hello", ", world"), delay=0.01):
+        self.pieces = pieces
+        self.delay = delay
+        self.streams = []
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, stream=False, **kwargs):
+        assert stream
+        chunks = [chunk(piece) for piece in self.pieces] + [chunk(finish_reason="stop"), chunk(usage=usage())]
+        self.streams.append(FakeStream(chunks, self.delay))
+        return self.streams[-1]
+
+    async def close(self):
+        pass
+
+
+def test_jobs_run_as_tasks_on_the_engine_loop(make_generator, tmp_path):
+    client = AsyncClient()
+    generator = make_generator(client)
+    runner = JobRunner(generator, JobStore(str(tmp_path / "jobs.sqlite3")))
+    job_id = runner.start("Dockerfile for a Flask app", "fp", tool="Docker")
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith("job-")]
+    assert "".join(runner.follow(job_id)) == "Hello, world"
+    assert runner.get(job_id).status == DONE
+    assert all(stream.closed for stream in client.streams)
+    assert metrics._gauges["engine_open_streams"] == 0
+
+
+def test_relay_streams_to_another_event_loop(make_generator):
+    generator = make_generator(AsyncClient())
+    generation = generator.generate("Dockerfile for a Flask app", "fp", tool="Docker")
+
+    async def consume():
+        return [piece async for piece in generator.engine.relay(generation)]
+
+    assert "".join(asyncio.run(consume())) == "Hello, world"
+    assert generation.source == OPENAI
+    assert generation.finish_reason == "stop"
+    assert generation.usage["completion_tokens"] == 2
+
+
+def test_identical_async_generations_share_one_call(make_generator):
+    client = AsyncClient(pieces=("a",) * 20)
+    generator = make_generator(client, AdmissionController(max_concurrent=1))
+    generations = [generator.generate("Terraform for an S3 bucket", f"fp{i}", tool="Terraform") for i in range(3)]
+
+    async def collect(generation):
+        return "".join([piece async for piece in generation])
+
+    async def run_all():
+        return await asyncio.gather(*(collect(generation) for generation in generations))
+
+    texts = generator.engine.submit(run_all()).result(timeout=10)
+    assert texts == ["a" * 20] * 3
+    assert len(client.streams) == 1
+    assert sorted(generation.source for generation in generations) == [COALESCED, COALESCED, OPENAI]
+
+
+def test_admission_queues_tasks_without_threads(make_generator):
+    client = AsyncClient()
+    generator = make_generator(client, AdmissionController(max_concurrent=1))
+    positions = []
+    generations = [
+        generator.generate(prompt, "fp", tool="Docker", on_queue=positions.append)
+        for prompt in ("Dockerfile for a Flask app", "Dockerfile for a Go service")
+    ]
+
+    async def collect(generation):
+        return "".join([piece async for piece in generation])
+
+    async def run_all():
+        return await asyncio.gather(*(collect(generation) for generation in generations))
+
+    assert generator.engine.submit(run_all()).result(timeout=10) == ["Hello, world"] * 2
+    assert positions == [1]
+    assert len(client.streams) == 2
+
+
+def test_closing_the_relay_cancels_the_call(make_generator):
+    client = AsyncClient(pieces=("a",) * 100, delay=0.05)
+    generator = make_generator(client)
+    generation = generator.generate("Terraform for an S3 bucket", "fp", tool="Terraform")
+
+    async def first_piece():
+        pieces = generator.engine.relay(generation)
+        async for piece in pieces:
+            await pieces.aclose()
+            return piece
+
+    assert asyncio.run(first_piece()) == "a"
+    # The leader let go of its flight and the provider stream was closed on the engine loop
+    generator.engine.submit(asyncio.sleep(0.2)).result()
+    assert client.streams[0].closed
+    assert not generator.flights._flights
+
+
+def test_cancelled_job_ends_for_its_followers(make_generator, tmp_path):
+    client = AsyncClient(pieces=("a",) * 100, delay=0.05)
+    generator = make_generator(client)
+    runner = JobRunner(generator, JobStore(str(tmp_path / "jobs.sqlite3")))
+    job_id = runner.start("Terraform for an S3 bucket", "fp", tool="Terraform")
+
+    async def cancel_jobs():
+        await asyncio.sleep(0.2)
+        for task in asyncio.all_tasks():
+            if task is not asyncio.current_task():
+                task.cancel()
+
+    generator.engine.submit(cancel_jobs())
+    outcome = []
+
+    def follow():
+        try:
+            "".join(runner.follow(job_id))
+        except JobFailed as e:
+            outcome.append(str(e))
+
+    follower = threading.Thread(target=follow, daemon=True)
+    follower.start()
+    follower.join(timeout=5)
+    assert outcome == [INTERRUPTED]
+    assert runner.get(job_id).status == FAILED
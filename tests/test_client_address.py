@@ -0,0 +1,19 @@
+from quota import client_address
+
+
+def test_spoofed_leftmost_entries_are_ignored():
+    # The client sent "1.1.1.1, 2.2.2.2"; our proxy appended the address it actually saw
+    assert client_address("1.1.1.1, 2.2.2.2, 203.0.113.7", "10.0.0.5", trusted_hops=1) == "203.0.113.7"
+
+
+def test_entry_from_outermost_of_several_trusted_proxies():
+    assert client_address("1.1.1.1, 203.0.113.7, 10.0.0.9", "10.0.0.5", trusted_hops=2) == "203.0.113.7"
+
+
+def test_peer_address_without_trusted_proxies():
+    assert client_address("1.1.1.1", "198.51.100.4", trusted_hops=0) == "198.51.100.4"
+
+
+def test_peer_address_when_the_proxy_chain_is_shorter_than_expected():
+    assert client_address("", "198.51.100.4", trusted_hops=1) == "198.51.100.4"
+    assert client_address("203.0.113.7", "198.51.100.4", trusted_hops=2) == "198.51.100.4"
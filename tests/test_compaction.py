@@ -0,0 +1,91 @@
+from compaction import compact, detect, minify
+
+
+def test_hcl_keeps_heredocs_and_quoted_comment_markers():
+    code = '''resource "aws_instance" "web" {
+  # the web tier
+  ami       = "ami-123" // pinned
+  user_data = <<-EOT
+    #!/bin/bash
+    # kept: this is the script, not a comment
+      echo "indent stays"
+  EOT
+  tags = { Name = "web#1", Url = "http://example.com/a//b" } /* inline */
+}
+'''
+    assert detect(code) == "hcl"
+    assert minify(code, "hcl") == '''resource "aws_instance" "web" {
+ami       = "ami-123"
+user_data = <<-EOT
+    #!/bin/bash
+    # kept: this is the script, not a comment
+      echo "indent stays"
+  EOT
+tags = { Name = "web#1", Url = "http://example.com/a//b" }
+}'''
+
+
+def test_yaml_keeps_block_scalars_and_quoted_hashes():
+    code = '''# deployment config
+apiVersion: v1
+kind: ConfigMap
+data:
+  color: "#ff0000"  # red
+  channel: '#alerts'
+  script: |
+    #!/bin/sh
+    echo "a # b"
+
+    exit 0
+  folded: >-
+    # also content
+metadata:
+  name: web   # trailing
+'''
+    assert minify(code, "yaml") == '''apiVersion: v1
+kind: ConfigMap
+data:
+  color: "#ff0000"
+  channel: '#alerts'
+  script: |
+    #!/bin/sh
+    echo "a # b"
+
+    exit 0
+  folded: >-
+    # also content
+metadata:
+  name: web'''
+
+
+def test_dockerfile_keeps_parser_directives_only_at_the_top():
+    code = '''# syntax=docker/dockerfile:1
+# escape=\\
+
+# build stage
+FROM python:3.12-slim
+# key=value after the first instruction is just a comment
+RUN <<EOF
+# part of the script
+pip install gunicorn
+EOF
+CMD ["gunicorn", "app:app"]
+'''
+    assert minify(code, "dockerfile") == '''# syntax=docker/dockerfile:1
+# escape=\\
+FROM python:3.12-slim
+RUN <<EOF
+# part of the script
+pip install gunicorn
+EOF
+CMD ["gunicorn", "app:app"]'''
+
+
+def test_prose_is_left_unchanged():
+    prompts = [
+        "Generate Terraform to create an EKS cluster with 2 node groups and S3 backend.",
+        "Write a C# service and a Go client.\n\n  - use // comments in the Go code\n  - tag #infra",
+        "Explain: why does name: value fail in my config?",
+    ]
+    for prompt in prompts:
+        assert compact(prompt) == prompt
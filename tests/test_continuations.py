@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+import pytest
+import generation
+from jobs import JobRunner, JobStore
+from conftest import FakeStream, chunk, usage
+
+
+class TruncatingClient:
+    # Every call streams 2,000 characters and stops on max_tokens; `fail_on` makes that call raise
+    def __init__(self, fail_on=None):
+        self.calls = []
+        self.fail_on = fail_on
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, stream=False, **kwargs):
+        self.calls.append(kwargs["max_tokens"])
+        if len(self.calls) == self.fail_on:
+            raise RuntimeError("400: max_tokens is too large")
+        piece = f"{len(self.calls)}" * 2000
+        return FakeStream([chunk(piece), chunk(finish_reason="length"), chunk(usage=usage(completion_tokens=2000))])
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def small_window(monkeypatch):
+    # One token per character on top of a 4,000-token prompt, in gpt-4's 8,192-token window
+    monkeypatch.setattr(generation, "count_messages", lambda messages, model: 4000 + sum(len(m["content"]) for m in messages[2:]))
+    monkeypatch.setattr(generation, "context_window", lambda model: 8192)
+
+
+def test_continuations_stop_before_the_context_window_is_full(make_generator):
+    client = TruncatingClient()
+    result = make_generator(client, max_continuations=5).generate("Create a Helm chart for a basic Go web app.", "fp", tool="Helm Charts")
+    text = "".join(result)
+    assert all(max_tokens >= generation.MIN_CONTINUATION_TOKENS for max_tokens in client.calls)
+    assert len(client.calls) == 2
+    assert result.finish_reason == "length"
+    assert text == result.text == "1" * 2000 + "2" * 2000
+
+
+def test_failed_continuation_keeps_the_truncated_answer(make_generator):
+    client = TruncatingClient(fail_on=2)
+    generator = make_generator(client, max_continuations=5)
+    result = generator.generate("Create a Helm chart for a basic Go web app.", "fp", tool="Helm Charts")
+    assert "".join(result) == "1" * 2000
+    assert result.finish_reason == "length"
+    # The first call was billed and its answer delivered: the free run is not refunded
+    assert generator.quota.remaining("fp") == generator.quota.daily_limit - 1
+
+
+def test_truncated_jobs_keep_their_finish_reason(make_generator, tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    runner = JobRunner(make_generator(TruncatingClient(fail_on=2), max_continuations=5), store)
+    job_id = runner.start("Create a Helm chart for a basic Go web app.", "fp", tool="Helm Charts")
+    assert "".join(runner.follow(job_id)) == "1" * 2000
+    assert runner.get(job_id).finish_reason == "length"
+    assert store.get(job_id).finish_reason == "length"
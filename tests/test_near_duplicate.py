@@ -0,0 +1,62 @@
+import pytest
+from near_duplicate import MinHashIndex
+
+
+CONTEXT = "gpt-4|system|0.2|2000"
+
+
+class Stored(dict):
+    # Stands in for the response cache's SQLite table of prompts
+    def load(self, key):
+        return self.get(key)
+
+
+def query(cached, context, asked):
+    index, stored = MinHashIndex(), Stored(cached=cached)
+    index.add("cached", CONTEXT, cached)
+    return index.query(context, asked, stored.load)
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("Generate a GitHub Actions workflow to deploy a Node.js app to AWS EC2.",
+     "Generate a GitHub Actions workflow to deploy a Node.js app to AWS ECS."),
+    ("Create a Dockerfile for a Python Flask app with gunicorn.",
+     "Create a Dockerfile for a Python Flask app without gunicorn."),
+    ("Write Azure CLI commands to provision an AKS cluster with autoscaling.",
+     "Write Azure CLI commands to provision an AKS cluster without autoscaling."),
+    ("Generate Terraform to create an EKS cluster with 2 node groups and S3 backend.",
+     "Generate Terraform to create an EKS cluster with 3 node groups and S3 backend."),
+])
+def test_different_requests_do_not_match(cached, asked):
+    assert query(cached, CONTEXT, asked) is None
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("Create a Dockerfile for a Python Flask app with gunicorn.",
+     "create a dockerfile for a python flask app with gunicorn"),
+    ("Generate Terraform to create an EKS cluster with 2 node groups and S3 backend.",
+     "Generate Terraform to create an EKS cluster with two node groups and S3 backend!"),
+])
+def test_rephrasings_still_match(cached, asked):
+    match = query(cached, CONTEXT, asked)
+    assert match is not None and match[0] == "cached"
+
+
+def test_other_context_never_matches():
+    prompt = "Create a Dockerfile for a Python Flask app with gunicorn."
+    assert query(prompt, "gpt-4o-mini|system|0.2|2000", prompt) is None
+
+
+def test_entries_keep_no_prompt_text_in_memory():
+    prompt = "resource \"aws_s3_bucket\" \"logs\" { bucket = \"app-logs\" }\n" * 500
+    index = MinHashIndex()
+    index.add("cached", CONTEXT, prompt)
+    context, signature, digest = index._entries["cached"]
+    assert len(signature) == index.num_perm and len(digest) == 16
+
+
+def test_evicted_prompts_never_match():
+    prompt = "Create a Dockerfile for a Python Flask app with gunicorn."
+    index = MinHashIndex()
+    index.add("cached", CONTEXT, prompt)
+    assert index.query(CONTEXT, prompt, Stored().load) is None
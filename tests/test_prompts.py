@@ -0,0 +1,22 @@
+from ledger import caches_prompts
+from prompts import BASE_SYSTEM_PROMPT, CORE_SYSTEM_PROMPT
+from tokens import count_tokens
+
+
+class NoClient:
+    async def close(self):
+        pass
+
+
+def test_long_prefix_goes_only_to_models_that_cache_it(make_generator):
+    generator = make_generator(NoClient())
+    generator.router.models = {"fast": "gpt-4o-mini", "strong": "gpt-4"}
+    # Docker routes to the fast tier, Terraform to the strong one
+    cheap = generator.generate("Dockerfile for a Flask app", "fp", tool="Docker")
+    strong = generator.generate("Terraform for an S3 bucket", "fp", tool="Terraform")
+    assert caches_prompts(cheap.model) and cheap.system_prompt.startswith(BASE_SYSTEM_PROMPT)
+    assert not caches_prompts(strong.model) and strong.system_prompt.startswith(CORE_SYSTEM_PROMPT)
+
+
+def test_short_prefix_is_a_fraction_of_the_long_one():
+    assert count_tokens(CORE_SYSTEM_PROMPT, "gpt-4") * 5 < count_tokens(BASE_SYSTEM_PROMPT, "gpt-4")
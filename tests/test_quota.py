@@ -0,0 +1,46 @@
+import pytest
+from admission import AdmissionController, QueueFull
+from conftest import FakeStream
+from ledger import UsageLedger
+from quota import QuotaStore
+
+
+class UnusedClient:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        return FakeStream([])
+
+    async def close(self):
+        pass
+
+
+def test_queue_full_refunds_the_rate_limit_tokens(make_generator):
+    client = UnusedClient()
+    generator = make_generator(client, AdmissionController(max_queue=0))
+    # More rejections than the client's burst: none of them may use up its rate or daily quota
+    for _ in range(generator.quota.burst + 2):
+        with pytest.raises(QueueFull):
+            "".join(generator.generate("Dockerfile for a Flask app", "fp", tool="Docker"))
+    assert client.calls == 0
+    assert generator.quota.remaining("fp") == generator.quota.daily_limit
+    assert generator.quota.try_acquire("fp", "gpt-4o-mini").allowed
+
+
+def test_rejected_requests_stay_out_of_the_ledger(make_generator, tmp_path):
+    ledger = UsageLedger(str(tmp_path / "usage.sqlite3"))
+    generator = make_generator(UnusedClient(), AdmissionController(max_queue=0), ledger=ledger)
+    with pytest.raises(QueueFull):
+        "".join(generator.generate("Dockerfile for a Flask app", "fp", tool="Docker"))
+    assert ledger.totals("source") == []
+
+
+def test_refund_never_exceeds_the_bucket_capacity(tmp_path):
+    quota = QuotaStore(str(tmp_path / "quota.sqlite3"), burst=2)
+    for _ in range(3):
+        quota.refund("fp", "gpt-4")
+    assert quota.try_acquire("fp", "gpt-4").allowed
+    assert quota.try_acquire("fp", "gpt-4").allowed
+    assert not quota.try_acquire("fp", "gpt-4").allowed
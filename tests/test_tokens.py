@@ -0,0 +1,18 @@
+import tiktoken
+import tokens
+
+
+def test_counts_fall_back_to_an_estimate_without_the_tokenizer(monkeypatch):
+    def unavailable(name):
+        raise ConnectionError("openaipublic.blob.core.windows.net is unreachable")
+
+    monkeypatch.undo()
+    monkeypatch.setattr(tiktoken, "encoding_for_model", unavailable)
+    monkeypatch.setattr(tiktoken, "get_encoding", unavailable)
+    tokens.get_encoding.cache_clear()
+    try:
+        assert tokens.count_tokens("x" * 400, "gpt-4") == 100
+        assert tokens.truncate("x" * 400, 10, "gpt-4") == "x" * 40
+        assert tokens.count_messages([{"content": "x" * 40}], "gpt-4") == 16
+    finally:
+        tokens.get_encoding.cache_clear()
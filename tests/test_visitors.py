@@ -0,0 +1,31 @@
+from circuit_breaker import OPEN
+from visitors import VisitorStats
+
+
+class Down:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, client):
+        self.calls += 1
+        raise ConnectionError("plausible is down")
+
+
+def test_open_circuit_skips_refreshes_for_its_cool_down():
+    fetch = Down()
+    stats = VisitorStats(interval=300, fetch=fetch)
+    for _ in range(stats.breaker.failure_threshold):
+        stats.refresh()
+    assert stats.breaker.state == OPEN
+    # The next refresh comes no sooner than the cool-down, which outlasts a refresh interval
+    assert stats._delay() > stats.interval
+    calls = fetch.calls
+    stats.refresh()
+    assert fetch.calls == calls
+
+
+def test_closed_circuit_refreshes_on_the_interval():
+    stats = VisitorStats(interval=300, fetch=lambda client: 7)
+    stats.refresh()
+    assert stats.snapshot().value == 7
+    assert stats._delay() == stats.interval
@@ -0,0 +1,56 @@
+from functools import lru_cache
+import tiktoken
+import metrics
+
+
+# ✅ Context windows (prompt + completion), for clamping max_tokens
+CONTEXT_WINDOWS = {
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+
+# Rough size of a token in English text and code, used when the tokenizer can't be loaded
+CHARS_PER_TOKEN = 4
+
+
+# ✅ Local tokenizer (encodings are loaded once per process)
+@lru_cache(maxsize=None)
+def get_encoding(model):
+    # tiktoken downloads the BPE file on first use; without it (offline, blocked egress) counts
+    # fall back to an estimate instead of failing every page render
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base" if "4o" in model else "cl100k_base")
+    except Exception:
+        metrics.incr("tokenizer_unavailable_total")
+        return None
+
+
+def count_tokens(text, model):
+    encoding = get_encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def count_messages(messages, model):
+    # Chat format overhead: ~3 tokens per message plus 3 to prime the reply
+    return sum(3 + count_tokens(message["content"], model) for message in messages) + 3
+
+
+def truncate(text, max_tokens, model):
+    encoding = get_encoding(model)
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def context_window(model):
+    return CONTEXT_WINDOWS.get(model, CONTEXT_WINDOWS["gpt-4"])
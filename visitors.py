@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from collections import namedtuple
+import httpx
+from circuit_breaker import CircuitBreaker, OPEN
+
+
+PLAUSIBLE_URL = "https://plausible.io/api/v1/stats/visitors"
+SITE_ID = "devops-copilot.onrender.com"
+
+Snapshot = namedtuple("Snapshot", ["value", "fetched_at"])
+EMPTY_SNAPSHOT = Snapshot(None, None)
+
+
+def fetch_visitor_count(client, timeout=5):
+    headers = {"Authorization": "Bearer " + os.environ["PLAUSIBLE_API_KEY"]}
+    params = {"site_id": SITE_ID, "period": "day"}
+    response = client.get(PLAUSIBLE_URL, headers=headers, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json().get("value", 0)
+
+
+# ✅ Visitor count refreshed by a background thread; readers only see the latest snapshot
+class VisitorStats:
+    def __init__(self, interval=300, fetch=fetch_visitor_count, breaker=None):
+        self.interval = interval
+        self._fetch = fetch
+        # Cool-downs shorter than a refresh interval would let a probe through on every refresh
+        self.breaker = breaker or CircuitBreaker("plausible", base_cooldown=2 * interval, max_cooldown=12 * interval)
+        self._client = httpx.Client(timeout=5)
+        self._snapshot = EMPTY_SNAPSHOT
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls):
+        interval = float(os.environ.get("VISITOR_COUNT_REFRESH_INTERVAL", 300))
+        breaker = CircuitBreaker(
+            "plausible",
+            failure_threshold=int(os.environ.get("PLAUSIBLE_BREAKER_FAILURES", 3)),
+            base_cooldown=float(os.environ.get("PLAUSIBLE_BREAKER_COOLDOWN", 2 * interval)),
+            max_cooldown=float(os.environ.get("PLAUSIBLE_BREAKER_MAX_COOLDOWN", 12 * interval)),
+        )
+        return cls(interval=interval, breaker=breaker)
+
+    def snapshot(self):
+        # A single attribute read: never blocks and never does I/O
+        return self._snapshot
+
+    def refresh(self):
+        # Single-flight: a refresh already in progress is not duplicated
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            if not self.breaker.allow():
+                return
+            self._snapshot = Snapshot(self._fetch(self._client), time.time())
+            self.breaker.record_success()
+        except Exception as e:
+            print(f"Visitor count error: {e}")
+            self.breaker.record_failure()
+            if self.breaker.state == OPEN:
+                # Negative cache: hide the visitor line until Plausible recovers
+                self._snapshot = EMPTY_SNAPSHOT
+        finally:
+            self._refresh_lock.release()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="visitor-stats", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _delay(self):
+        # While the circuit is open, sleep through the cool-down instead of waking up to be refused
+        return max(self.interval, self.breaker.retry_in())
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self._delay())
+        self._client.close()